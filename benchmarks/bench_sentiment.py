@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+CPU throughput benchmark of sentiment scoring.
+
+Scores the same synthetic workload of news snippets and long articles with
+
+    baseline : one pipeline call per text, truncated to 512 characters (the
+               SentimentAnalyzerTool.run of before batching)
+    torch    : SentimentAnalyzerTool.run_batch on the fp32 model
+    int8     : run_batch on the dynamically quantized model
+    onnx     : run_batch on ONNX Runtime (needs optimum[onnxruntime])
+
+and reports texts/s, texts/s per core, and how often each backend agrees with
+the fp32 labels. Every backend runs with an empty score cache; a second pass
+over the same texts measures the cached path. Needs transformers and torch;
+the model is downloaded on the first run.
+
+    python benchmarks/bench_sentiment.py --texts 500 --threads 4
+    python benchmarks/bench_sentiment.py --backends torch int8 --long 0.2
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from benchmarks.bench_server import git_commit, RESULTS_DIR
+
+COMPANIES = ["Apple", "Tesla", "Boeing", "Pfizer", "Intel", "Netflix", "Oracle", "Nvidia"]
+EVENTS = [
+    ("{c} shares jump after record quarterly revenue beats estimates", "positive"),
+    ("{c} wins approval for its new product line in Europe", "positive"),
+    ("Analysts upgrade {c} citing strong demand and margin expansion", "positive"),
+    ("{c} faces class action lawsuit over misleading investor statements", "negative"),
+    ("Regulators open fraud investigation into {c} accounting practices", "negative"),
+    ("{c} recalls vehicles after safety defect linked to crashes", "negative"),
+    ("{c} announces layoffs as sales slump for a third quarter", "negative"),
+    ("{c} schedules its annual shareholder meeting for next month", "neutral"),
+]
+FILLER = ("The company said in a statement that it continues to review the matter and will "
+          "provide further updates to investors as more information becomes available. ")
+
+
+def make_texts(count: int, long_share: float, seed: int):
+    """Snippets of one or two sentences, a share of them padded into multi-window articles"""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        text = " ".join(rng.choice(EVENTS)[0].format(c=rng.choice(COMPANIES)) + "." for _ in range(rng.randint(1, 2)))
+        if rng.random() < long_share:
+            text += " " + FILLER * rng.randint(15, 40)
+        texts.append(text)
+    return texts
+
+
+def cores() -> int:
+    import torch
+    return torch.get_num_threads()
+
+
+def run_baseline(texts):
+    from transformers import pipeline
+    from shared.config import SENTIMENT_MODEL
+    classifier = pipeline("sentiment-analysis", model=SENTIMENT_MODEL)
+    classifier(texts[0][:512])   # warm-up
+    start = time.perf_counter()
+    labels = [classifier(text[:512])[0]["label"] for text in texts]
+    return time.perf_counter() - start, labels, None
+
+
+def run_backend(backend, texts):
+    from server.tools.sentiment_analyzer import SentimentAnalyzerTool
+    tool = SentimentAnalyzerTool(backend=backend, cache_db=None)
+    tool.run_batch(["warm-up"])
+    tool.cache.clear()
+    start = time.perf_counter()
+    labels = [result["label"] for result in tool.run_batch(texts)]
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    tool.run_batch(texts)
+    return elapsed, labels, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["baseline", "torch", "int8", "onnx"],
+                        choices=["baseline", "torch", "int8", "onnx"])
+    parser.add_argument("--texts", type=int, default=300)
+    parser.add_argument("--long", type=float, default=0.1, help="share of long articles in the workload")
+    parser.add_argument("--threads", type=int, help="torch intra-op threads, defaults to all cores")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="result file, defaults to benchmarks/results/bench_sentiment-<commit>-<time>.json")
+    args = parser.parse_args()
+
+    import torch
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    texts = make_texts(args.texts, args.long, args.seed)
+    reference = None
+    runs = []
+    for backend in args.backends:
+        print(f"[bench] {backend}: {len(texts)} texts on {cores()} threads")
+        try:
+            elapsed, labels, cached = run_baseline(texts) if backend == "baseline" else run_backend(backend, texts)
+        except Exception as e:
+            print(f"[bench] {backend} failed: {e}")
+            runs.append({"backend": backend, "error": str(e)})
+            continue
+        if backend == "torch":
+            reference = labels
+        run = {
+            "backend": backend,
+            "seconds": round(elapsed, 3),
+            "texts_per_s": round(len(texts) / elapsed, 2),
+            "texts_per_s_per_core": round(len(texts) / elapsed / cores(), 2),
+            "labels": labels,
+        }
+        if cached is not None:
+            run["cached_texts_per_s"] = round(len(texts) / cached, 2)
+        runs.append(run)
+        print(f"[bench] {backend}: {run['texts_per_s']} texts/s, {run['texts_per_s_per_core']} per core")
+
+    for run in runs:
+        labels = run.pop("labels", None)
+        if reference and labels:
+            run["agreement_with_torch"] = round(sum(a == b for a, b in zip(labels, reference)) / len(reference), 4)
+
+    commit = git_commit()
+    report = {
+        "benchmark": "bench_sentiment",
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {"texts": args.texts, "long_share": args.long, "threads": cores(), "seed": args.seed},
+        "runs": runs,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"bench_sentiment-{commit}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"[bench] results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Offline throughput/latency benchmark of the request handler.
+
+Starts local stand-ins for Google CSE, SerpAPI, SEC EDGAR, yfinance and Gemini
+(see benchmarks/upstreams.py), then drives realistic mixed batches through
+
+    handler : Dispatcher.handle_batch in-process (what request_handler runs)
+    wsgi    : POST /requests on the Flask app of server.py
+    asgi    : POST /requests on the Starlette app of server/asgi.py
+
+and reports throughput, p50/p95/p99 batch latency, per-tool latency and
+memory. Results are written as JSON to benchmarks/results/ so runs on
+different commits can be compared:
+
+    python benchmarks/bench_server.py --modes handler wsgi --batches 200 --concurrency 16
+    python benchmarks/bench_server.py --latency gemini=1.5 --error-rate serpapi=0.1
+    python benchmarks/bench_server.py --compare benchmarks/results/a.json benchmarks/results/b.json
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from benchmarks.upstreams import UPSTREAMS, StandIns, UpstreamProfile
+
+RESULTS_DIR = PROJECT_ROOT / "benchmarks" / "results"
+
+DEFAULT_LATENCY = {"google_cse": 0.35, "serpapi": 0.5, "sec": 0.15, "yfinance": 0.6, "gemini": 1.5}
+
+COMPANIES = [
+    ("Apple", "AAPL", "320193"), ("Microsoft", "MSFT", "789019"), ("Tesla", "TSLA", "1318605"),
+    ("Amazon", "AMZN", "1018724"), ("Nvidia", "NVDA", "1045810"), ("Meta Platforms", "META", "1326801"),
+    ("Alphabet", "GOOGL", "1652044"), ("Netflix", "NFLX", "1065280"), ("Intel", "INTC", "50863"),
+    ("Oracle", "ORCL", "1341439"), ("Boeing", "BA", "12927"), ("Pfizer", "PFE", "78003"),
+]
+
+
+def make_batch(rng: random.Random, companies: int) -> dict:
+    """A batch shaped like the ones the LLM planner produces: 3-5 I/O-bound calls about one company"""
+    name, ticker, cik = COMPANIES[rng.randrange(min(companies, len(COMPANIES)))]
+    candidates = [
+        ("tools/websearch", {"query": f"Detail Company profile of {name} site:crunchbase.com OR site:forbes.com"}),
+        ("tools/websearch", {"query": f"{name} leadership and board of directors"}),
+        ("tools/news", {"name": name}),
+        ("tools/financial_descriptor", {"ticker": ticker, "cik": cik}),
+        ("tools/gemini", {"query": f"Summarize the main business risks of {name}."}),
+    ]
+    chosen = rng.sample(candidates, rng.randint(3, 5))
+    return {
+        "id": f"bench-{uuid.uuid4()}",
+        "requests": [{"id": f"req-{i}", "method": m, "params": p} for i, (m, p) in enumerate(chosen)],
+        "timing": True,
+    }
+
+
+def percentile(values, q):
+    """Nearest-rank percentile, q in [0, 100]"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(q / 100 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(values_ms):
+    if not values_ms:
+        return {}
+    return {
+        "p50": round(percentile(values_ms, 50), 2),
+        "p95": round(percentile(values_ms, 95), 2),
+        "p99": round(percentile(values_ms, 99), 2),
+        "mean": round(sum(values_ms) / len(values_ms), 2),
+        "max": round(max(values_ms), 2),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def load_flask_server():
+    """Imports server.py under another name, `server` is the package next to it"""
+    spec = importlib.util.spec_from_file_location("server_app", PROJECT_ROOT / "server.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def fresh_cache(dispatcher, enabled: bool):
+    """Memory-only result cache for the run, empty unless --cache is given"""
+    from server.cache import ResultCache
+    dispatcher.cache = ResultCache(db_file=None, max_entries=4096 if enabled else 0)
+
+
+class Target:
+    """Something a batch can be sent to"""
+
+    def __init__(self, mode, send, close=lambda: None):
+        self.mode = mode
+        self.send = send
+        self.close = close
+
+
+def handler_target(flask_module, use_cache):
+    dispatcher = flask_module.dispatcher
+    fresh_cache(dispatcher, use_cache)
+    return Target("handler", dispatcher.handle_batch)
+
+
+def http_target(mode, url, start_server, stop_server):
+    import requests
+    local = threading.local()
+
+    def send(batch):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        response = session.post(url, json=batch, timeout=300)
+        response.raise_for_status()
+        return response.json()
+
+    start_server()
+    return Target(mode, send, stop_server)
+
+
+def wsgi_target(flask_module, use_cache):
+    from werkzeug.serving import make_server
+    fresh_cache(flask_module.dispatcher, use_cache)
+    port = free_port()
+    server = make_server("127.0.0.1", port, flask_module.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+
+    def stop():
+        server.shutdown()
+
+    return http_target("wsgi", f"http://127.0.0.1:{port}/requests", thread.start, stop)
+
+
+def asgi_target(use_cache):
+    import uvicorn
+    from server import asgi
+    fresh_cache(asgi.dispatcher, use_cache)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(asgi.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+
+    def start():
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    return http_target("asgi", f"http://127.0.0.1:{port}/requests", start, stop)
+
+
+def run_load(target, batches, concurrency, companies, seed):
+    """Sends `batches` batches from `concurrency` clients and collects latencies"""
+    rng = random.Random(seed)
+    work = [make_batch(rng, companies) for _ in range(batches)]
+    batch_ms, tool_ms = [], defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+
+    def one(batch):
+        start = time.perf_counter()
+        try:
+            response = target.send(batch)
+        except Exception as e:
+            with lock:
+                errors[f"transport:{type(e).__name__}"] += 1
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            batch_ms.append(elapsed)
+            for entry in response.get("results", []):
+                if "error" in entry:
+                    errors[entry["method"]] += 1
+                if "elapsed_ms" in entry:
+                    tool_ms[entry["method"]].append(entry["elapsed_ms"])
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, work))
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    calls = sum(len(b["requests"]) for b in work)
+    return {
+        "mode": target.mode,
+        "batches": batches,
+        "calls": calls,
+        "duration_s": round(duration, 3),
+        "throughput": {
+            "batches_per_s": round(batches / duration, 2),
+            "calls_per_s": round(calls / duration, 2),
+        },
+        "batch_latency_ms": summarize(batch_ms),
+        "tool_latency_ms": {tool: summarize(values) for tool, values in sorted(tool_ms.items())},
+        "errors": dict(errors),
+        "memory": {
+            "tracemalloc_peak_mb": round(peak / 2 ** 20, 2),
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+        },
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def parse_overrides(pairs, flag):
+    overrides = {}
+    for pair in pairs or []:
+        name, _, value = pair.partition("=")
+        if name not in UPSTREAMS or not value:
+            raise SystemExit(f"{flag} expects <upstream>=<value> with upstream in {', '.join(UPSTREAMS)}")
+        overrides[name] = float(value)
+    return overrides
+
+
+def compare(old_path, new_path):
+    """Prints the change of every headline number between two result files"""
+    old = {r["mode"]: r for r in json.loads(Path(old_path).read_text())["runs"]}
+    new = {r["mode"]: r for r in json.loads(Path(new_path).read_text())["runs"]}
+    for mode in sorted(set(old) & set(new)):
+        print(f"[{mode}]")
+        rows = [("batches/s", ("throughput", "batches_per_s"))] + [
+            (f"{q} ms", ("batch_latency_ms", q)) for q in ("p50", "p95", "p99")
+        ] + [("peak MB", ("memory", "tracemalloc_peak_mb"))]
+        for label, (group, key) in rows:
+            a, b = old[mode][group].get(key), new[mode][group].get(key)
+            if a is None or b is None:
+                continue
+            change = (b - a) / a * 100 if a else 0.0
+            print(f"  {label:<10} {a:>10} -> {b:>10}  ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["handler", "wsgi"], choices=["handler", "wsgi", "asgi"])
+    parser.add_argument("--batches", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--companies", type=int, default=len(COMPANIES),
+                        help="distinct companies in the workload, fewer means more duplicate calls")
+    parser.add_argument("--latency", nargs="*", metavar="UPSTREAM=SECONDS", help="mean stand-in latency")
+    parser.add_argument("--error-rate", nargs="*", metavar="UPSTREAM=RATE", help="stand-in failure rate")
+    parser.add_argument("--jitter", type=float, default=0.5, help="sigma of the lognormal latency")
+    parser.add_argument("--cache", action="store_true", help="keep the result cache on (off by default)")
+    parser.add_argument("--rate-limits", action="store_true",
+                        help="keep the upstream rate scheduler on (off by default, it would dominate the numbers)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="result file, defaults to benchmarks/results/<commit>-<time>.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    latency = {**DEFAULT_LATENCY, **parse_overrides(args.latency, "--latency")}
+    error_rate = parse_overrides(args.error_rate, "--error-rate")
+    profiles = {
+        name: UpstreamProfile(latency=latency[name], jitter=args.jitter, error_rate=error_rate.get(name, 0.0))
+        for name in UPSTREAMS
+    }
+
+    stand_ins = StandIns(profiles).start()
+    # The tool modules read endpoints and keys at import time
+    os.environ.update(stand_ins.env())
+    stand_ins.install()
+    flask_module = load_flask_server()
+    from server.tools.rate_limiter import rate_limits
+    rate_limits.enabled = args.rate_limits
+
+    runs = []
+    try:
+        for mode in args.modes:
+            if mode == "handler":
+                target = handler_target(flask_module, args.cache)
+            elif mode == "wsgi":
+                target = wsgi_target(flask_module, args.cache)
+            else:
+                target = asgi_target(args.cache)
+            before = stand_ins.calls()
+            try:
+                print(f"[bench] {mode}: {args.batches} batches, {args.concurrency} clients")
+                run = run_load(target, args.batches, args.concurrency, args.companies, args.seed)
+            finally:
+                target.close()
+            after = stand_ins.calls()
+            run["upstream_calls"] = {name: after[name] - before[name] for name in UPSTREAMS}
+            runs.append(run)
+            print(f"[bench] {mode}: {run['throughput']['batches_per_s']} batches/s, "
+                  f"p50 {run['batch_latency_ms'].get('p50')} ms, p95 {run['batch_latency_ms'].get('p95')} ms, "
+                  f"p99 {run['batch_latency_ms'].get('p99')} ms, errors {sum(run['errors'].values())}")
+    finally:
+        stand_ins.stop()
+
+    commit = git_commit()
+    report = {
+        "benchmark": "bench_server",
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "batches": args.batches, "concurrency": args.concurrency, "companies": args.companies,
+            "cache": args.cache, "rate_limits": args.rate_limits, "seed": args.seed, "jitter": args.jitter,
+            "latency_s": latency, "error_rate": {n: profiles[n].error_rate for n in UPSTREAMS},
+        },
+        "runs": runs,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"bench_server-{commit}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"[bench] results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
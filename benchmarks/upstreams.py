@@ -0,0 +1,293 @@
+# benchmarks/upstreams.py
+
+"""
+Local stand-ins for the upstream APIs used by the server tools.
+
+SerpAPI and SEC EDGAR are plain HTTP APIs, so they are served by a local
+threaded HTTP server that the tools reach through SERP_URL /
+SEC_SUBMISSIONS_URL; so is Google CSE's REST endpoint (GOOGLE_CSE_URL), which
+the async tools call. yfinance, Gemini, SMTP and googleapiclient (the sync
+Google CSE path) are reached through client libraries, so their entry points
+are replaced in-process. Every
+stand-in sleeps for a configurable latency and fails at a configurable rate.
+"""
+
+import asyncio
+import json
+import math
+import random
+import smtplib
+import threading
+import time
+import types
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+UPSTREAMS = ("google_cse", "serpapi", "sec", "yfinance", "gemini")
+
+
+@dataclass
+class UpstreamProfile:
+    """Latency and failure behaviour of one stand-in"""
+    latency: float = 0.2       # mean seconds per call
+    jitter: float = 0.5        # sigma of the lognormal latency, 0 for a constant latency
+    error_rate: float = 0.0    # share of calls that fail
+
+    def delay(self) -> float:
+        if self.jitter <= 0:
+            return self.latency
+        mu = math.log(max(self.latency, 1e-6)) - self.jitter ** 2 / 2
+        return random.lognormvariate(mu, self.jitter)
+
+    def wait(self):
+        time.sleep(self.delay())
+
+    def fails(self) -> bool:
+        return random.random() < self.error_rate
+
+
+class StandInError(Exception):
+    """Raised by the in-process stand-ins to simulate an upstream failure"""
+
+
+# ---- HTTP stand-ins: SerpAPI and SEC EDGAR ---------------------------------
+
+def _serp_payload(query: str, news: bool) -> dict:
+    key = "news_results" if news else "organic_results"
+    return {key: [
+        {
+            "title": f"{query} result {i}",
+            "snippet": f"Stand-in snippet {i} for {query}.",
+            "link": f"https://example.com/{abs(hash((query, i))) % 10000}",
+            "date": "1 day ago",
+        }
+        for i in range(5)
+    ]}
+
+
+def _cse_payload(query: str, num: int) -> dict:
+    return {"items": [
+        {
+            "title": f"{query} result {i}",
+            "snippet": f"Stand-in snippet {i} for {query}.",
+            "link": f"https://example.org/{abs(hash((query, i))) % 10000}",
+        }
+        for i in range(num)
+    ]}
+
+
+def _sec_payload(cik: str) -> dict:
+    return {"cik": cik, "filings": {"recent": {
+        "form": ["10-K", "8-K", "10-Q", "10-Q"],
+        "filingDate": ["2025-02-01", "2025-01-15", "2024-11-01", "2024-08-01"],
+        "primaryDocument": [f"{cik}/10k.htm", f"{cik}/8k.htm", f"{cik}/10q3.htm", f"{cik}/10q2.htm"],
+    }}}
+
+
+class StandInHTTPServer:
+    """
+    Threaded local HTTP server answering /search (SerpAPI), /customsearch/v1 (Google CSE)
+    and /submissions/CIK*.json (SEC)
+    """
+
+    def __init__(self, profiles: dict):
+        self.profiles = profiles
+        self.calls = {"serpapi": 0, "google_cse": 0, "sec": 0}
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path.startswith("/search"):
+                    upstream = "serpapi"
+                    params = parse_qs(url.query)
+                    query = params.get("q", [""])[0]
+                    payload = _serp_payload(query, news=params.get("tbm", [""])[0] == "nws")
+                elif url.path.startswith("/customsearch/"):
+                    upstream = "google_cse"
+                    params = parse_qs(url.query)
+                    payload = _cse_payload(params.get("q", [""])[0], int(params.get("num", ["5"])[0]))
+                elif url.path.startswith("/submissions/"):
+                    upstream = "sec"
+                    payload = _sec_payload(url.path.rsplit("CIK", 1)[-1].split(".")[0])
+                else:
+                    self.send_error(404)
+                    return
+                stand_in.calls[upstream] += 1
+                profile = stand_in.profiles[upstream]
+                profile.wait()
+                if profile.fails():
+                    self.send_error(503 if upstream == "sec" else 429)
+                    return
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# ---- In-process stand-ins: Google CSE, yfinance, Gemini, SMTP ---------------
+
+class StandInCSE:
+    """Mimics googleapiclient's customsearch service: service.cse().list(...).execute()"""
+
+    def __init__(self, profile: UpstreamProfile):
+        self.profile = profile
+        self.calls = 0
+
+    def cse(self):
+        return self
+
+    def list(self, q, cx=None, num=5, **kwargs):
+        return types.SimpleNamespace(execute=lambda: self._execute(q, num))
+
+    def _execute(self, query, num):
+        self.calls += 1
+        self.profile.wait()
+        if self.profile.fails():
+            raise StandInError("Google CSE stand-in: 429 rateLimitExceeded")
+        return _cse_payload(query, num)
+
+
+class StandInYFinance:
+    """Mimics the part of the yfinance module used by FinancialDataTool"""
+
+    def __init__(self, profile: UpstreamProfile):
+        self.profile = profile
+        self.calls = 0
+        stand_in = self
+
+        class Ticker:
+            def __init__(self, ticker):
+                self.ticker = ticker
+
+            @property
+            def info(self):
+                stand_in.calls += 1
+                stand_in.profile.wait()
+                if stand_in.profile.fails():
+                    raise StandInError("yfinance stand-in: 404")
+                return {
+                    "longName": f"{self.ticker} Corp",
+                    "sector": "Technology",
+                    "marketCap": 1_000_000_000,
+                    "trailingPE": 21.5,
+                    "totalRevenue": 250_000_000,
+                    "longBusinessSummary": f"{self.ticker} is a stand-in company.",
+                }
+
+        self.Ticker = Ticker
+
+
+class StandInGeminiModel:
+    """Mimics genai.GenerativeModel.generate_content / generate_content_async"""
+
+    def __init__(self, profile: UpstreamProfile):
+        self.profile = profile
+        self.calls = 0
+
+    def _answer(self, query):
+        if self.profile.fails():
+            raise StandInError("Gemini stand-in: 429 Resource has been exhausted")
+        return types.SimpleNamespace(text=f"Stand-in answer to: {query[:80]}")
+
+    def generate_content(self, query):
+        self.calls += 1
+        self.profile.wait()
+        return self._answer(query)
+
+    async def generate_content_async(self, query):
+        self.calls += 1
+        await asyncio.sleep(self.profile.delay())
+        return self._answer(query)
+
+
+class StandInSMTP:
+    """No-op smtplib.SMTP so MailSender can be constructed offline"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def starttls(self):
+        pass
+
+    def login(self, *args):
+        pass
+
+    def send_message(self, msg):
+        pass
+
+    def quit(self):
+        pass
+
+
+class StandIns:
+    """Starts every stand-in and patches the tool modules to use them"""
+
+    def __init__(self, profiles: dict):
+        self.profiles = profiles
+        self.http = StandInHTTPServer(profiles)
+        self.cse = StandInCSE(profiles["google_cse"])
+        self.yfinance = StandInYFinance(profiles["yfinance"])
+        self.gemini = StandInGeminiModel(profiles["gemini"])
+
+    def env(self) -> dict:
+        """Environment the tool modules must be imported with"""
+        return {
+            "SERP_URL": f"{self.http.base_url}/search",
+            "GOOGLE_CSE_URL": f"{self.http.base_url}/customsearch/v1",
+            "SEC_SUBMISSIONS_URL": f"{self.http.base_url}/submissions",
+            "GOOGL_SEARCH_KEY": "stand-in", "CSE": "stand-in", "SERP_KEY": "stand-in",
+            "GEMINI_KEY": "stand-in", "SENDER_MAIL": "bench@localhost", "MAIL_PASS": "stand-in",
+        }
+
+    def start(self):
+        self.http.start()
+        return self
+
+    def install(self):
+        """
+        Patches the client-library entry points. Must run after the environment from
+        env() is set and before UTIL is constructed.
+        """
+        smtplib.SMTP = StandInSMTP
+        from server.tools import web_search, financial_data, gemini
+        web_search.build = lambda *args, **kwargs: self.cse
+        financial_data.yf = self.yfinance
+        gemini.genai = types.SimpleNamespace(configure=lambda **kwargs: None, GenerativeModel=lambda *args: self.gemini)
+        if hasattr(gemini.GeminiAgent, "instance"):
+            gemini.GeminiAgent.instance.model = self.gemini
+
+    def calls(self) -> dict:
+        return {
+            "google_cse": self.cse.calls + self.http.calls["google_cse"],
+            "serpapi": self.http.calls["serpapi"],
+            "sec": self.http.calls["sec"],
+            "yfinance": self.yfinance.calls,
+            "gemini": self.gemini.calls,
+        }
+
+    def stop(self):
+        self.http.stop()
@@ -10,16 +10,21 @@ from langchain_core.output_parsers import StrOutputParser
 
 from client.pydantic_models import RequestPayload
 from client.config import SERVER_URL, GEMINI_API_KEY
+from shared.http import server_session
 
 class AutoInvestigatorAgent:
     """
     The client-side agent that interacts with the user, the LLM, and the MCP server.
     """
-    def __init__(self):
+    def __init__(self, stream_results: bool = False):
         """
         Initializes the agent, setting up the LLM and the server URL.
+
+        Args:
+            stream_results : receive tool results from the server as each one completes
         """
         self.server_url = SERVER_URL
+        self.stream_results = stream_results
         self.llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", google_api_key=GEMINI_API_KEY)
 
     def _get_main_prompt(self) -> str:
@@ -36,7 +41,7 @@ class AutoInvestigatorAgent:
                 }
             ]
         }
-        response = requests.post(self.server_url, json=payload)
+        response = server_session().post(self.server_url, json=payload)
         response.raise_for_status()
         return response.json()["results"][0]["results"][0]
 
@@ -88,10 +93,41 @@ class AutoInvestigatorAgent:
         print("Sending request to server...")
         # Validate the request payload using Pydantic
         request_payload = RequestPayload(**request_json)
-        response = requests.post(self.server_url, json=request_payload.dict())
+        if self.stream_results:
+            return self._collect_streamed_results(request_payload)
+        response = server_session().post(self.server_url, json=request_payload.dict())
         response.raise_for_status()
         return response.json()
 
+    def _stream_server_request(self, request_payload: RequestPayload):
+        """
+        Sends the request in NDJSON streaming mode and yields each result entry
+        as soon as the server finishes it.
+        """
+        with server_session().post(self.server_url, params={"stream": "ndjson"}, json=request_payload.dict(), stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                entry = json.loads(line)
+                if entry.get("done"):
+                    break
+                if "results" not in entry:
+                    raise ValueError(f"Server rejected the request: {entry}")
+                yield entry
+
+    def _collect_streamed_results(self, request_payload: RequestPayload) -> dict:
+        """
+        Consumes the streamed results, reporting each one on arrival, and returns
+        them in the same shape (and request order) as the non-streaming response.
+        """
+        arrived = {}
+        for entry in self._stream_server_request(request_payload):
+            print(f"Received {entry['method']} ({entry['id']})")
+            arrived[entry["id"]] = entry
+        ordered = [arrived[req.id] for req in request_payload.requests if req.id in arrived]
+        return {"id": request_payload.id, "results": ordered}
+
     def _get_final_response(self, user_query: str, server_results: dict) -> str:
         """
         Gets the final, summarized response from the LLM.
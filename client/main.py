@@ -4,10 +4,10 @@ import time
 import random
 import string
 import uuid
-import requests
 from urllib.parse import urljoin
 
 from client.config import SERVER_URL
+from shared.http import server_session
 
 SERVER_BASE_URL = SERVER_URL.rsplit('/', 1)[0]
 
@@ -138,7 +138,7 @@ def investigate():
             ]
         }
 
-        server_resp = requests.post(SERVER_URL, json=payload)
+        server_resp = server_session().post(SERVER_URL, json=payload)
         server_resp.raise_for_status()
         server_json = server_resp.json()
 
@@ -224,7 +224,7 @@ def upload_pdf():
 
     try:
         server_url = urljoin(SERVER_BASE_URL + '/', 'upload-pdf')
-        resp = requests.post(server_url, files=files, data=data)
+        resp = server_session().post(server_url, files=files, data=data)
         resp.raise_for_status()
         return jsonify(resp.json())
     except Exception as e:
@@ -17,6 +17,7 @@ class RequestPayload(BaseModel):
     """
     id: str
     requests: List[Request]
+    timing: Optional[bool] = None  # ask the server for per-entry 'elapsed_ms'
 
 class Result(BaseModel):
     """
@@ -25,6 +26,8 @@ class Result(BaseModel):
     id: str
     method: str
     results: List[Any]
+    error: Optional[str] = None
+    elapsed_ms: Optional[float] = None
 
 class ResponsePayload(BaseModel):
     """
@@ -1,6 +1,7 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from dotenv import load_dotenv
 import os
+import threading
 
 
 app=Flask(__name__)
@@ -75,13 +76,69 @@ Basic Response Format:
         }
     ]
 }
+
+References (opt-in): a param value of the form
+    {"$ref": <request_id>, "path": "<field>.<field>..."}
+is replaced by that part of the referenced request's result (a single result is
+addressed directly, lists by index), e.g. "ticker": {"$ref": "t1", "path": "ticker"}.
+A request runs once everything it references has finished; if one of them failed
+it gets an 'error' instead. Unknown, duplicate-id or circular references make the
+whole batch a Bad Request.
+
+Streaming Response Format (opt-in, POST /requests?stream=ndjson or ?stream=sse,
+or an Accept header of application/x-ndjson / text/event-stream):
+    one entry of 'results' per line/event, in completion order, as soon as its tool finishes
+        {id:<request_id>, method: "tools/<tool_name>", results:[...]}
+        ...
+    followed by
+        {id:<id>, done: true}
+    SSE events are named 'result' (with the request id as the event id) and 'done'.
+
+Timing (opt-in): with 'timing: true' at the top level of the request every
+result entry also carries 'elapsed_ms', the server-side time of that call.
+
+Background jobs (for slow batches, e.g. long Gemini calls, and large PDFs):
+    POST /jobs with a batch in the Basic Request Format, or POST /upload-pdf with
+    the form field async=true, answers 202 right away with
+        {job_id:<job id>, status:"queued"}
+    GET /jobs/<job id> then returns
+        {id:<job id>, kind:"batch"|"pdf", status:"queued"|"running"|"done"|"failed",
+         created_at, started_at, finished_at, result:<response>, error:<message>}
+    with 'result' once done and 'error' once failed. Jobs are persisted and resume
+    after a restart; finished jobs can be polled for JOB_RETENTION seconds.
 """
 
 from server.interface import UTIL
-from server.prompts.primary_prompts import BASIC_REQUEST_TEMPLATE,BASIC_PROMPT
-from server.tool_descriptor import get_tool_description, get_prompt_list
+from server.dispatcher import Dispatcher, STREAM_MIMETYPES, encode_event, stream_mode
+from server.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from server.jobs import QueueFullError, create_job_queue
+from server.tools.news_watchlist import WatchlistMonitor
+from shared.config import WATCHLIST_MONITOR
 
 util = UTIL()
+dispatcher = Dispatcher(util)
+
+_jobs = None
+_jobs_lock = threading.Lock()
+
+
+def job_queue():
+    """Background JobQueue, created on first use so only the serving process resumes unfinished jobs"""
+    global _jobs
+    with _jobs_lock:
+        if _jobs is None:
+            _jobs = create_job_queue(dispatcher)
+        return _jobs
+
+
+def start_watchlist_monitor():
+    """Background rescans of the news watchlist, run by the serving process only"""
+    if WATCHLIST_MONITOR:
+        WatchlistMonitor(util.watchlist, util.news).start()
+
+
+def is_truthy(value):
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
 
 
 @app.route('/upload-pdf', methods=['POST'])
@@ -95,6 +152,16 @@ def upload_pdf():
     
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
+
+    if is_truthy(request.form.get('async', request.args.get('async', ''))):
+        # Analyze in the background, the client polls GET /jobs/<job_id>
+        try:
+            jobs = job_queue()
+            path = jobs.spool(file.read(), suffix='.pdf')
+            job_id = jobs.submit('pdf', {'path': path, 'filename': file.filename, 'analysis_type': analysis_type})
+        except QueueFullError as e:
+            return jsonify({'error': str(e)}), 503
+        return jsonify({'job_id': job_id, 'status': 'queued'}), 202
     
     try:
         result = util.analyze_pdf(file, analysis_type)
@@ -104,83 +171,49 @@ def upload_pdf():
     
     
 def request_handler(request):
-    try:
-        id = request['id'] if 'id' in request else None
-        response = {'id':id, 'results':[]}
-        
-        for req in request['requests']:
-            res = {}
-            res['id'] = req['id']
-            res['method'] = req['method']
-            n, method = req['method'].strip().split('/') 
-            
-            if n=='tools':
-                if method == "websearch":
-                    query = req['params']['query']
-                    ans = util.get_web_search(query)
-                    res['results'] = [ans]
-                elif method == "financial_descriptor":
-                    ticker = req['params'].get('ticker')
-                    if ticker is None:
-                        ticker = "Unknown"
-                    cik = req['params'].get('cik')
-                    if cik is None:
-                        cik = "Unknown"
-                    print(f"Ticker: {ticker}, CIK: {cik}")
-                    ans = util.get_financial_data(ticker=ticker,cik=cik)
-                    res['results'] = [ans]
-                elif method == "news":
-                    name = req['params']['name']
-    # Call the tool once and store the result in 'ans'
-                    ans = util.get_news(name=name)
-    # Reuse the result
-                    res['results'] = [ans]
-                elif method == "send_mail":
-                    subject = req['params']['subject']
-                    message = req['params']['message']
-                    receiver = req['params']['receiver']
-                    res['results']=[util.send_mail(subject=subject, message=message, receiver=receiver)]
-                elif method == "list":
-                    ans = get_tool_description()
-                    res['results'] = [ans]
-                elif method == "gemini":
-                    query = req['params']['query']
-                    ans = util.llm.run(query) # 'util.llm' is the GeminiAgent instance
-                    res['results'] = [ans]
-                elif method == "pdf_analysis":
-                    # This would be called from the web interface
-                    # The actual file upload happens via the separate endpoint
-                    res['results'] = [{"message": "Use /upload-pdf endpoint for PDF analysis"}]
-                else:
-                    res['results'] = []
-                    
-            elif n=="prompt":
-                if method == "request_template":
-                    res['results'] = [BASIC_REQUEST_TEMPLATE]
-                elif method == "main_prompt":
-                    res['results'] = [BASIC_PROMPT]
-                elif method == "list":
-                    L = get_prompt_list()
-                    res['results'] = L
-                else:
-                    res['results'] = []
-                          
-            elif n=="resources":
-                pass
-                
-            response['results'].append(res)
-        return response
-    except Exception as e:
-        print(f"[request_handler] Error processing request: {e}")
-        return {"message": "Bad Request. Please check the format", "error": str(e)}
+    """Executes a batch concurrently, see Dispatcher.handle_batch"""
+    return dispatcher.handle_batch(request)
 
 
 @app.route('/requests',methods=['POST'])
 def base():
     data = request.get_json()
     print(data)
+    mode = stream_mode(request.args.get('stream'), request.headers.get('Accept'))
+    if mode:
+        # Opt-in: emit each entry of 'results' as soon as its tool completes
+        events = (encode_event(mode, entry) for entry in dispatcher.iter_batch(data))
+        return Response(stream_with_context(events), mimetype=STREAM_MIMETYPES[mode])
     res = request_handler(data)
     return jsonify(res)
+
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queues a batch as a background job and returns its id right away"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('requests'), list):
+        return jsonify({"message": "Bad Request. Please check the format"}), 400
+    try:
+        job_id = job_queue().submit('batch', data)
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify({'job_id': job_id, 'status': 'queued'}), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Status of a background job, with its result once done"""
+    job = job_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    return jsonify(job)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Per-tool call/error counts, latency histograms, retries and cache hit ratios"""
+    return Response(dispatcher.render_metrics(), mimetype=METRICS_CONTENT_TYPE)
     
    
 
@@ -188,4 +221,13 @@ if __name__ == '__main__':
     load_dotenv()
 
     port = int(os.getenv('SERVER_PORT', 8000))
-    app.run(debug=True, port=port)
+    if os.getenv('SERVER_MODE', 'wsgi') == 'asgi':
+        # Same /requests and /upload-pdf contract, tool I/O on an event loop
+        import uvicorn
+        uvicorn.run("server.asgi:app", port=port)
+    else:
+        if os.environ.get('WERKZEUG_RUN_MAIN'):
+            # Serving process of the reloader: resume jobs left unfinished by the last run
+            job_queue()
+            start_watchlist_monitor()
+        app.run(debug=True, port=port)
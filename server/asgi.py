@@ -0,0 +1,146 @@
+# server/asgi.py
+
+"""
+Async serving mode of the server.
+
+Exposes the same /requests, /upload-pdf and /jobs contract as the Flask app in
+server.py, but batches are executed on an event loop: tools with an async
+variant are awaited directly and blocking tools run on a bounded worker pool,
+so one process can hold many concurrent investigations without pinning a
+thread per in-flight upstream call. The async variants cover websearch (Google
+CSE and SerpAPI), news, the SEC half of financial_descriptor (over a shared
+httpx.AsyncClient) and gemini; yfinance, the SQLite-backed tools, sentiment
+and PDFReader stay blocking.
+
+Run with:
+    SERVER_MODE=asgi python server.py
+or
+    uvicorn server.asgi:app --port 8000
+"""
+
+import asyncio
+import contextlib
+import io
+
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.datastructures import FileStorage
+
+load_dotenv()
+
+from server.interface import UTIL
+from server.dispatcher import Dispatcher, STREAM_MIMETYPES, encode_event, stream_mode
+from server.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from server.jobs import QueueFullError, create_job_queue
+from server.tools.news_watchlist import WatchlistMonitor
+from shared.config import ASYNC_MAX_WORKERS, WATCHLIST_MONITOR
+from shared.http import aclose_async_http
+
+util = UTIL()
+dispatcher = Dispatcher(util, max_workers=ASYNC_MAX_WORKERS)
+jobs = None   # background JobQueue, created at startup so unfinished jobs resume right away
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global jobs
+    jobs = create_job_queue(dispatcher)
+    monitor = WatchlistMonitor(util.watchlist, util.news).start() if WATCHLIST_MONITOR else None
+    try:
+        yield
+    finally:
+        if monitor:
+            monitor.stop()
+        jobs.close()
+        await aclose_async_http()
+
+
+def is_truthy(value):
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+async def requests_endpoint(request):
+    try:
+        data = await request.json()
+    except Exception as e:
+        return JSONResponse({"message": "Bad Request. Please check the format", "error": str(e)}, status_code=400)
+    print(data)
+    mode = stream_mode(request.query_params.get('stream'), request.headers.get('accept'))
+    if mode:
+        # Opt-in: emit each entry of 'results' as soon as its tool completes
+        async def events():
+            async for entry in dispatcher.aiter_batch(data):
+                yield encode_event(mode, entry)
+        return StreamingResponse(events(), media_type=STREAM_MIMETYPES[mode])
+    res = await dispatcher.ahandle_batch(data)
+    return JSONResponse(res)
+
+
+async def upload_pdf(request):
+    """Handle PDF upload and analysis"""
+    form = await request.form()
+    upload = form.get('file')
+    analysis_type = form.get('analysis_type', 'comprehensive')
+
+    if upload is None or isinstance(upload, str):
+        return JSONResponse({'error': 'No file provided'}, status_code=400)
+    if upload.filename == '':
+        return JSONResponse({'error': 'No file selected'}, status_code=400)
+
+    data = await upload.read()
+    if is_truthy(form.get('async', request.query_params.get('async', ''))):
+        # Analyze in the background, the client polls GET /jobs/<job_id>
+        try:
+            path = jobs.spool(data, suffix='.pdf')
+            job_id = jobs.submit('pdf', {'path': path, 'filename': upload.filename, 'analysis_type': analysis_type})
+        except QueueFullError as e:
+            return JSONResponse({'error': str(e)}, status_code=503)
+        return JSONResponse({'job_id': job_id, 'status': 'queued'}, status_code=202)
+
+    try:
+        # PDFReader works on werkzeug's FileStorage, same as the Flask endpoint
+        file = FileStorage(stream=io.BytesIO(data), filename=upload.filename, content_type=upload.content_type)
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(dispatcher.cpu_executor, util.analyze_pdf, file, analysis_type)
+        return JSONResponse(result)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def submit_job(request):
+    """Queues a batch as a background job and returns its id right away"""
+    try:
+        data = await request.json()
+    except Exception as e:
+        return JSONResponse({"message": "Bad Request. Please check the format", "error": str(e)}, status_code=400)
+    if not isinstance(data, dict) or not isinstance(data.get('requests'), list):
+        return JSONResponse({"message": "Bad Request. Please check the format"}, status_code=400)
+    try:
+        job_id = jobs.submit('batch', data)
+    except QueueFullError as e:
+        return JSONResponse({'error': str(e)}, status_code=503)
+    return JSONResponse({'job_id': job_id, 'status': 'queued'}, status_code=202)
+
+
+async def job_status(request):
+    """Status of a background job, with its result once done"""
+    job = jobs.get(request.path_params['job_id'])
+    if job is None:
+        return JSONResponse({'error': 'Unknown or expired job'}, status_code=404)
+    return JSONResponse(job)
+
+
+async def metrics_endpoint(request):
+    """Per-tool call/error counts, latency histograms, retries and cache hit ratios"""
+    return Response(dispatcher.render_metrics(), headers={'content-type': METRICS_CONTENT_TYPE})
+
+
+app = Starlette(routes=[
+    Route('/requests', requests_endpoint, methods=['POST']),
+    Route('/upload-pdf', upload_pdf, methods=['POST']),
+    Route('/jobs', submit_job, methods=['POST']),
+    Route('/jobs/{job_id}', job_status, methods=['GET']),
+    Route('/metrics', metrics_endpoint, methods=['GET']),
+], lifespan=lifespan)
@@ -0,0 +1,260 @@
+# server/cache.py
+
+"""
+Tiered TTL cache of tool results.
+
+Tier 1 is a bounded in-memory LRU, tier 2 a SQLite table that survives
+restarts. Entries expire after the TTL declared on the tool; a disk hit is
+promoted back into memory. Hit/miss counters are kept per tool.
+
+`BlobCache` holds large values addressed by content hash (PDF analyses),
+bounded by total size instead of by TTL.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+from typing import Any, Tuple
+
+from shared.config import CACHE_DB, CACHE_MEMORY_ENTRIES
+
+_MISS = (False, None)
+
+
+class ResultCache:
+    def __init__(self, db_file: str = CACHE_DB, max_entries: int = CACHE_MEMORY_ENTRIES):
+        """
+        Args:
+            db_file : SQLite file of the disk tier, None keeps the cache in memory only
+            max_entries : capacity of the in-memory LRU tier
+        """
+        self.max_entries = max_entries
+        self._memory = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._counters = defaultdict(lambda: {"memory_hits": 0, "disk_hits": 0, "misses": 0})
+        self.conn = None
+        if db_file:
+            directory = os.path.dirname(db_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Shared by the worker threads, every access goes through self._lock
+            self.conn = sqlite3.connect(db_file, check_same_thread=False)
+            self._create_table()
+            self.purge_expired()
+
+    def _create_table(self):
+        try:
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                tool TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            """)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"[ResultCache] Database error: {e}")
+
+    def get(self, key: str, tool: str = "") -> Tuple[bool, Any]:
+        """Returns (hit, value) for a key, checking memory first, then disk"""
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._counters[tool]["memory_hits"] += 1
+                    return True, value
+                del self._memory[key]
+
+            if self.conn is not None:
+                try:
+                    row = self.conn.execute(
+                        "SELECT value, expires_at FROM results WHERE key = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    print(f"[ResultCache] Failed to read {key}: {e}")
+                    row = None
+                if row and row[1] > now:
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self._counters[tool]["disk_hits"] += 1
+                    return True, value
+
+            self._counters[tool]["misses"] += 1
+            return _MISS
+
+    def set(self, key: str, value: Any, ttl: float, tool: str = ""):
+        """Stores a value in both tiers for ttl seconds. A ttl of 0 stores nothing."""
+        if ttl <= 0:
+            return
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+            if self.conn is None:
+                return
+            try:
+                payload = json.dumps(value)
+            except (TypeError, ValueError):
+                return  # not JSON serializable, keep it in memory only
+            try:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO results (key, tool, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, tool, payload, expires_at),
+                )
+                self.conn.commit()
+            except sqlite3.Error as e:
+                print(f"[ResultCache] Failed to store {key}: {e}")
+
+    def _remember(self, key, expires_at, value):
+        """Inserts into the LRU tier, evicting the least recently used entries. Caller holds the lock."""
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_or_call(self, key: str, ttl: float, fn, *args, tool: str = "", **kwargs):
+        """Returns the cached value of key, or calls fn and caches what it returns"""
+        hit, value = self.get(key, tool)
+        if hit:
+            return value
+        value = fn(*args, **kwargs)
+        self.set(key, value, ttl, tool)
+        return value
+
+    def purge_expired(self) -> int:
+        """Drops expired entries from both tiers and returns how many disk rows were removed"""
+        now = time.time()
+        with self._lock:
+            for key in [k for k, (expires_at, _) in self._memory.items() if expires_at <= now]:
+                del self._memory[key]
+            if self.conn is None:
+                return 0
+            try:
+                cursor = self.conn.execute("DELETE FROM results WHERE expires_at <= ?", (now,))
+                self.conn.commit()
+                return cursor.rowcount
+            except sqlite3.Error as e:
+                print(f"[ResultCache] Failed to purge: {e}")
+                return 0
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self.conn is not None:
+                self.conn.execute("DELETE FROM results")
+                self.conn.commit()
+
+    def stats(self) -> dict:
+        """Hit/miss counters per tool plus the current size of the memory tier"""
+        with self._lock:
+            tools = {tool: dict(counts) for tool, counts in self._counters.items()}
+            return {"memory_entries": len(self._memory), "tools": tools}
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+
+
+class BlobCache:
+    """
+    Persistent cache of large JSON values addressed by content hash, bounded by
+    size: values are stored zlib-compressed and the least recently used entries
+    are evicted once the total exceeds max_bytes. Entries do not expire, the
+    content behind a hash never changes.
+    """
+
+    def __init__(self, db_file: str, max_bytes: int):
+        """
+        Args:
+            db_file : SQLite file, None keeps the cache in memory only
+            max_bytes : bound on the total compressed size of the values
+        """
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+        if db_file:
+            directory = os.path.dirname(db_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        # Shared by the worker threads, every access goes through self._lock
+        self.conn = sqlite3.connect(db_file or ":memory:", check_same_thread=False)
+        self._create_table()
+
+    def _create_table(self):
+        try:
+            self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS blobs_last_used ON blobs (last_used);
+            """)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"[BlobCache] Database error: {e}")
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Returns (hit, value) for a key"""
+        with self._lock:
+            try:
+                row = self.conn.execute("SELECT value FROM blobs WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self._counters["misses"] += 1
+                    return _MISS
+                self.conn.execute("UPDATE blobs SET last_used = ? WHERE key = ?", (time.time(), key))
+                self.conn.commit()
+            except sqlite3.Error as e:
+                print(f"[BlobCache] Failed to read {key}: {e}")
+                return _MISS
+            self._counters["hits"] += 1
+        return True, json.loads(zlib.decompress(row[0]))
+
+    def set(self, key: str, value: Any):
+        """Stores a JSON-serializable value, evicting old entries to stay within max_bytes"""
+        payload = zlib.compress(json.dumps(value).encode("utf-8"))
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            try:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO blobs (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                    (key, payload, len(payload), time.time()),
+                )
+                self._evict()
+                self.conn.commit()
+            except sqlite3.Error as e:
+                print(f"[BlobCache] Failed to store {key}: {e}")
+
+    def _evict(self):
+        """Drops least recently used entries until the total size fits. Caller holds the lock."""
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.conn.execute("SELECT key, size FROM blobs ORDER BY last_used").fetchall():
+            self.conn.execute("DELETE FROM blobs WHERE key = ?", (key,))
+            self._counters["evictions"] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            return {"entries": entries, "bytes": size, **self._counters}
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM blobs")
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,549 @@
+# server/dispatcher.py
+
+"""
+Executes /requests batches against the tool registries.
+
+The same Dispatcher backs both serving modes: `handle_batch`/`iter_batch` are
+used by the Flask app in server.py, `ahandle_batch`/`aiter_batch` by the ASGI
+app in server/asgi.py. The iter_* variants stream entries as they complete.
+
+A param may reference the output of another request of the same batch:
+    {"$ref": "<request id>", "path": "ticker"}
+is replaced by the 'ticker' field of that request's result before the call
+runs. Requests run as soon as everything they reference has finished, so
+independent requests still run concurrently.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Optional
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from server.prompts.primary_prompts import PROMPTS
+from server.metrics import metrics
+from server.singleflight import SingleFlight
+from server.tools.registry import RegisteredTool, ToolRegistry, UncachedResults, CPU
+from server.tools.resilience import cancel_scope
+from shared.config import MAX_WORKERS, TOOL_TIMEOUT, MAX_ABANDONED_CALLS, CPU_WORKERS
+
+# Opt-in streaming modes of /requests
+NDJSON = "ndjson"
+SSE = "sse"
+STREAM_MIMETYPES = {NDJSON: "application/x-ndjson", SSE: "text/event-stream"}
+
+
+def stream_mode(query_value=None, accept=None):
+    """
+    Picks the streaming mode of a /requests call from the '?stream=' query
+    param or the Accept header. Returns None for the default single JSON document.
+    """
+    if query_value:
+        mode = query_value.strip().lower()
+        return mode if mode in STREAM_MIMETYPES else None
+    accept = accept or ""
+    if STREAM_MIMETYPES[SSE] in accept:
+        return SSE
+    if STREAM_MIMETYPES[NDJSON] in accept:
+        return NDJSON
+    return None
+
+
+def encode_event(mode, entry):
+    """
+    Encodes one streamed item. Result entries carry their request id; the
+    closing item is {"id": <batch id>, "done": true}.
+    """
+    data = json.dumps(entry)
+    if mode == SSE:
+        if entry.get('done'):
+            return f"event: done\ndata: {data}\n\n"
+        return f"id: {entry.get('id')}\nevent: result\ndata: {data}\n\n"
+    return data + "\n"
+
+
+# Key of a reference to another request's output inside params
+REF = "$ref"
+
+
+class RefError(ValueError):
+    """Raised when a referenced output does not contain the requested path"""
+
+
+def find_refs(value) -> set:
+    """Request ids referenced anywhere in a params structure"""
+    if isinstance(value, dict):
+        if REF in value:
+            return {value[REF]}
+        return set().union(*(find_refs(v) for v in value.values()))
+    if isinstance(value, list):
+        return set().union(*(find_refs(v) for v in value))
+    return set()
+
+
+def resolve_refs(value, outputs: Dict[str, list]):
+    """
+    Replaces every {"$ref": <id>, "path": <dotted path>} in a params structure
+    with the matching part of outputs[<id>], the results list of that request.
+    """
+    if isinstance(value, dict):
+        if REF in value:
+            return _lookup(outputs[value[REF]], value.get("path"), value[REF])
+        return {k: resolve_refs(v, outputs) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve_refs(v, outputs) for v in value]
+    return value
+
+
+def _lookup(results, path, ref):
+    # Most tools return a single value: address it directly rather than as results[0]
+    value = results[0] if len(results) == 1 else results
+    for part in str(path).split(".") if path else []:
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            raise RefError(f"'{path}' not found in the output of request {ref}")
+    return value
+
+
+def check_dependencies(calls):
+    """Rejects references to unknown, ambiguous or self-dependent requests and cycles"""
+    counts = {}
+    for call in calls:
+        counts[call.res['id']] = counts.get(call.res['id'], 0) + 1
+    for call in calls:
+        for dep in call.deps:
+            if dep not in counts:
+                raise ValueError(f"Request {call.res['id']} references unknown request {dep}")
+            if counts[dep] > 1:
+                raise ValueError(f"Request {call.res['id']} references request {dep}, whose id is not unique")
+    # Kahn's algorithm: whatever cannot be ordered sits on a cycle
+    remaining = {call.res['id']: set(call.deps) for call in calls if call.deps}
+    done = {id for id in counts if id not in remaining}
+    while remaining:
+        ready = [id for id, deps in remaining.items() if deps <= done]
+        if not ready:
+            raise ValueError(f"Circular references between requests {', '.join(map(str, sorted(remaining, key=str)))}")
+        for id in ready:
+            done.add(id)
+            del remaining[id]
+
+
+@dataclass
+class Call:
+    """One entry of a batch, resolved and ready to run"""
+    res: Dict[str, Any]                 # response entry, filled in when the call finishes
+    entry: Optional[RegisteredTool]     # None for unknown methods
+    params: Optional[Dict[str, Any]]
+    timeout: float
+    timing: bool = False                # report server-side time as res['elapsed_ms']
+    deps: FrozenSet[str] = frozenset()  # ids of the requests whose output the params reference
+    submitted: Optional[float] = None   # monotonic time the call was queued for a worker
+    started: Optional[float] = None     # monotonic time a worker picked it up, the timeout counts from here
+    cancel: threading.Event = field(default_factory=threading.Event)   # set when the call timed out
+
+    @property
+    def deadline(self) -> float:
+        """Time the call times out at, or, while it waits for a worker, stops waiting"""
+        return (self.started or self.submitted) + self.timeout
+
+    @property
+    def label(self) -> str:
+        """Metric label, bounded to registered methods"""
+        return self.res['method'].strip() if self.entry else "unknown"
+
+
+class Dispatcher:
+    """
+    Resolves each entry of a batch to its registered tool and runs the entries concurrently.
+    """
+
+    def __init__(self, util, max_workers: int = MAX_WORKERS, cpu_workers: int = CPU_WORKERS):
+        self.util = util
+        # O(1) dispatch: namespace -> registry -> registered tool
+        self.registries = {
+            'tools': util.registry,
+            'prompt': PROMPTS,
+            'resources': ToolRegistry(),
+        }
+        # Bounded pool shared by every batch, so concurrent batches cannot spawn unbounded threads.
+        # In async mode it only runs the blocking I/O tools, off the event loop.
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # kind=CPU tools get their own small pool: inference cannot occupy the workers HTTP-bound tools wait on
+        self.cpu_executor = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix="cpu")
+        self.cache = util.cache
+        # Identical in-flight calls of cacheable tools share one upstream execution,
+        # within a batch and across concurrent batches
+        self.inflight = SingleFlight()
+        # Timed-out calls still running on a worker thread, capped by max_abandoned
+        self.max_abandoned = MAX_ABANDONED_CALLS
+        self._abandoned = 0
+        self._abandoned_lock = threading.Lock()
+
+    def executor_for(self, entry):
+        """Pool a tool runs on, according to its declared kind"""
+        if entry is not None and entry.spec.kind == CPU:
+            return self.cpu_executor
+        return self.executor
+
+    def resolve(self, n, method):
+        """
+        Looks up the registered tool/prompt/resource for a method
+
+        Args:
+            n : namespace of the method ('tools', 'prompt' or 'resources')
+            method : name of the tool/prompt/resource
+        """
+        registry = self.registries.get(n)
+        return registry.get(method) if registry is not None else None
+
+    def plan(self, request):
+        """
+        Validates the batch format and resolves every entry.
+        Raises on a malformed batch so the caller can answer 'Bad Request'.
+
+        Returns:
+            (response skeleton, list of Call)
+        """
+        id = request['id'] if 'id' in request else None
+        response = {'id':id, 'results':[]}
+        timing = bool(request.get('timing'))
+        calls = []
+        for req in request['requests']:
+            res = {}
+            res['id'] = req['id']
+            res['method'] = req['method']
+            n, method = req['method'].strip().split('/')
+            entry = self.resolve(n, method)
+            timeout = (entry.spec.timeout if entry else None) or TOOL_TIMEOUT
+            params = req.get('params')
+            calls.append(Call(res, entry, params, timeout, timing, frozenset(find_refs(params))))
+        check_dependencies(calls)
+        return response, calls
+
+    def render_metrics(self) -> str:
+        """Text exposition of the /metrics endpoint"""
+        return metrics.render(cache_stats=self.cache.stats(), singleflight=self.inflight)
+
+    def _run(self, entry, params):
+        """
+        Runs a single entry of a batch and returns its results list.
+        Cacheable tools are served from the result cache when fresh, otherwise
+        executed once per key (coalesced) and stored with the tool's TTL.
+        """
+        if entry is None:
+            return []
+        if not entry.spec.cacheable:
+            return entry.call(params)
+        key = entry.key(params)
+        hit, results = self.cache.get(key, entry.spec.name)
+        if hit:
+            return list(results)
+        return list(self.inflight.do(key, self._call_and_store, entry, params, key))
+
+    def _call_and_store(self, entry, params, key):
+        results = entry.call(params)
+        self._store(entry, key, results)
+        return results
+
+    def _store(self, entry, key, results):
+        """Caches the results of a call for the tool's TTL, unless the tool marked them Uncacheable"""
+        if isinstance(results, UncachedResults):
+            return
+        self.cache.set(key, results, entry.spec.ttl, entry.spec.name)
+
+    def _timed_run(self, call):
+        """_run on a worker thread, recording the call in the metrics. Returns (results, seconds)."""
+        call.started = time.monotonic()
+        start = time.perf_counter()
+        try:
+            # Retry loops of the tool stop once the call is cancelled by its timeout
+            with cancel_scope(call.cancel):
+                results = self._run(call.entry, call.params)
+        except Exception:
+            metrics.observe_call(call.label, time.perf_counter() - start, error=True)
+            raise
+        elapsed = time.perf_counter() - start
+        metrics.observe_call(call.label, elapsed)
+        return results, elapsed
+
+    async def _acall(self, entry, params):
+        if not entry.spec.cacheable:
+            return await entry.acall(params, self.executor_for(entry))
+        key = entry.key(params)
+        hit, results = self.cache.get(key, entry.spec.name)
+        if hit:
+            return list(results)
+        return list(await self.inflight.ado(key, self._acall_and_store, entry, params, key))
+
+    async def _acall_and_store(self, entry, params, key):
+        results = await entry.acall(params, self.executor_for(entry))
+        self._store(entry, key, results)
+        return results
+
+    @staticmethod
+    def _fail(res, error):
+        print(f"[Dispatcher] {res['method']} failed: {error}")
+        res['results'] = []
+        res['error'] = error
+
+    def _submit(self, call):
+        call.submitted = time.monotonic()
+        return self.executor_for(call.entry).submit(self._timed_run, call)
+
+    def _abandon(self, call, future):
+        """
+        Gives up on a call that timed out while running: its thread cannot be
+        interrupted, so it is told to stop retrying and counted until it returns.
+        """
+        call.cancel.set()
+        with self._abandoned_lock:
+            self._abandoned += 1
+        future.add_done_callback(self._release_abandoned)
+
+    def _release_abandoned(self, _future):
+        with self._abandoned_lock:
+            self._abandoned -= 1
+
+    def _saturated(self):
+        """Error message when timed-out calls hold too many workers to take a new call"""
+        with self._abandoned_lock:
+            if self._abandoned < self.max_abandoned:
+                return None
+            return f"Worker pool busy with {self._abandoned} timed-out calls, try again later"
+
+    def _bind_refs(self, call, finished):
+        """
+        Substitutes the outputs of the finished dependencies into call.params.
+        Returns an error message when a dependency failed or a path is missing.
+        """
+        if not call.deps:
+            return None
+        for dep in sorted(call.deps, key=str):
+            if 'error' in finished[dep]:
+                return f"Dependency {dep} failed: {finished[dep]['error']}"
+        try:
+            call.params = resolve_refs(call.params, {dep: finished[dep]['results'] for dep in call.deps})
+        except RefError as e:
+            return str(e)
+        return None
+
+    def _schedule(self, calls):
+        """
+        Runs the calls of a batch on the worker pool, each as soon as the requests
+        it references have finished, and yields every response entry as it completes.
+        """
+        waiting = list(calls)
+        finished = {}   # request id -> response entry
+        pending = {}    # future -> call
+        try:
+            while waiting or pending:
+                released = True
+                while released:
+                    released = False
+                    for call in list(waiting):
+                        if not call.deps <= finished.keys():
+                            continue
+                        waiting.remove(call)
+                        error = self._bind_refs(call, finished) or self._saturated()
+                        if error is None:
+                            pending[self._submit(call)] = call
+                            continue
+                        self._fail(call.res, error)
+                        finished[call.res['id']] = call.res
+                        released = True
+                        yield call.res
+                if not pending:
+                    break
+                nearest = min(call.deadline for call in pending.values())
+                done, _ = wait(pending, timeout=max(0, nearest - time.monotonic()), return_when=FIRST_COMPLETED)
+                now = time.monotonic()
+                for future in list(pending):
+                    call = pending[future]
+                    # The deadline moves from queueing to running when a worker picks the call up
+                    if future not in done and call.deadline > now:
+                        continue
+                    res = self._collect(call, future)
+                    if res is None:
+                        continue
+                    del pending[future]
+                    finished[res['id']] = res
+                    yield res
+        finally:
+            # Client went away: drop the calls that have not started yet, stop the others retrying
+            for future, call in pending.items():
+                if not future.cancel():
+                    call.cancel.set()
+
+    def _collect(self, call, future):
+        """
+        Response entry of a call that finished or passed its deadline, never waits.
+        Returns None when a worker picked the call up just now: its run deadline starts.
+        """
+        res = call.res
+        if not future.done():
+            if future.cancel():
+                metrics.observe_timeout(call.label)
+                self._fail(res, f"No worker free within {call.timeout} seconds")
+            elif call.deadline > time.monotonic():
+                return None
+            else:
+                metrics.observe_timeout(call.label)
+                self._abandon(call, future)
+                self._fail(res, f"Timed out after {call.timeout} seconds")
+            return res
+        try:
+            res['results'], elapsed = future.result()
+            if call.timing:
+                res['elapsed_ms'] = round(elapsed * 1000, 1)
+        except Exception as e:
+            self._fail(res, str(e))
+        return res
+
+    def handle_batch(self, request):
+        """
+        Executes every entry of a batch concurrently on the shared worker pool,
+        entries that reference other entries once those have finished.
+        Results are returned in request order. An entry that raises or exceeds
+        its timeout (or depends on one that did) gets empty results and an
+        'error' field instead of failing the batch. The timeout counts from the
+        moment a worker starts the call; waiting for a free worker is bounded
+        separately by the same number of seconds.
+        """
+        try:
+            response, calls = self.plan(request)
+        except Exception as e:
+            print(f"[request_handler] Error processing request: {e}")
+            return {"message": "Bad Request. Please check the format", "error": str(e)}
+
+        for _ in self._schedule(calls):
+            pass
+        response['results'] = [call.res for call in calls]
+        return response
+
+    def iter_batch(self, request):
+        """
+        Streaming version of handle_batch: yields each response entry as soon as
+        its tool completes (or times out), then a closing {"id": <batch id>, "done": true}.
+        """
+        try:
+            response, calls = self.plan(request)
+        except Exception as e:
+            print(f"[request_handler] Error processing request: {e}")
+            yield {"message": "Bad Request. Please check the format", "error": str(e)}
+            return
+
+        yield from self._schedule(calls)
+        yield {'id': response['id'], 'done': True}
+
+    async def _arun(self, call):
+        res = call.res
+        if call.entry is not None and call.entry.ahandler is None:
+            return await self._arun_on_worker(call)
+        start = time.perf_counter()
+        try:
+            if call.entry is None:
+                res['results'] = []
+            else:
+                res['results'] = await asyncio.wait_for(self._acall(call.entry, call.params), call.timeout)
+            elapsed = time.perf_counter() - start
+            metrics.observe_call(call.label, elapsed)
+            if call.timing:
+                res['elapsed_ms'] = round(elapsed * 1000, 1)
+        except asyncio.TimeoutError:
+            metrics.observe_timeout(call.label)
+            self._fail(res, f"Timed out after {call.timeout} seconds")
+        except Exception as e:
+            metrics.observe_call(call.label, time.perf_counter() - start, error=True)
+            self._fail(res, str(e))
+        return res
+
+    async def _arun_on_worker(self, call):
+        """
+        _arun of a blocking tool, under the same timeout rules as _schedule: the
+        timeout counts from the moment a worker starts the call, a call that times
+        out is cancelled and counted as abandoned until its thread returns.
+        """
+        error = self._saturated()
+        if error is not None:
+            self._fail(call.res, error)
+            return call.res
+        future = self._submit(call)
+        waiter = asyncio.wrap_future(future)
+        # An abandoned call may still fail later, when nobody awaits it anymore
+        waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            while True:
+                await asyncio.wait({waiter}, timeout=max(0, call.deadline - time.monotonic()))
+                # The deadline moves from queueing to running when a worker picks the call up
+                if not future.done() and call.deadline > time.monotonic():
+                    continue
+                res = self._collect(call, future)
+                if res is not None:
+                    return res
+        except asyncio.CancelledError:
+            # Client went away: drop the call if it has not started yet, stop it retrying otherwise
+            if not future.cancel():
+                call.cancel.set()
+            raise
+
+    async def _arun_after(self, call, tasks):
+        """_arun once the requests referenced by the call have finished"""
+        if call.deps:
+            # shield: a dependency is shared, cancelling one dependent must not cancel it
+            finished = {dep: await asyncio.shield(tasks[dep]) for dep in call.deps}
+            error = self._bind_refs(call, finished)
+            if error is not None:
+                self._fail(call.res, error)
+                return call.res
+        return await self._arun(call)
+
+    def _start_tasks(self, calls):
+        tasks = {}
+        ordered = []
+        for call in calls:
+            task = asyncio.ensure_future(self._arun_after(call, tasks))
+            tasks[call.res['id']] = task
+            ordered.append(task)
+        return ordered
+
+    async def ahandle_batch(self, request):
+        """
+        Event-loop version of handle_batch. Tools with an async variant are awaited
+        on the loop, blocking tools run on the worker pool with the timeouts of handle_batch.
+        """
+        try:
+            response, calls = self.plan(request)
+        except Exception as e:
+            print(f"[request_handler] Error processing request: {e}")
+            return {"message": "Bad Request. Please check the format", "error": str(e)}
+
+        response['results'] = list(await asyncio.gather(*self._start_tasks(calls)))
+        return response
+
+    async def aiter_batch(self, request):
+        """Event-loop version of iter_batch"""
+        try:
+            response, calls = self.plan(request)
+        except Exception as e:
+            print(f"[request_handler] Error processing request: {e}")
+            yield {"message": "Bad Request. Please check the format", "error": str(e)}
+            return
+
+        tasks = self._start_tasks(calls)
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+        yield {'id': response['id'], 'done': True}
@@ -1,11 +1,20 @@
+import asyncio
+
 from server.tools.web_search import WebSearchTool
 from server.tools.ticker_manager import TickerManager
 from server.tools.financial_data import FinancialDataTool
 from server.tools.sec_filings import SECFilingsTool
 from server.tools.news_scanner import NewsScannerTool
+from server.tools.news_watchlist import NewsWatchlist
+from server.tools.news_pipeline import NewsPipelineTool
 from server.tools.mail_sender import MailSender
+from server.tools.sentiment_analyzer import SentimentAnalyzerTool
 from server.tools.gemini import GeminiAgent
 from server.tools.pdf_reader import analyze_pdf_report
+from server.cache import ResultCache
+from server.tools.registry import tool, async_variant, Param, ToolRegistry, IO, CPU, MissingParamError, Uncacheable
+from shared.utils import normalize_cik, normalize_company, normalize_query, normalize_window
+from shared.config import SEARCH_MAX_QUERIES, NEWS_WINDOW, SENTIMENT_MAX_TEXTS
 
 class UTIL:
     def __init__(self):
@@ -14,18 +23,70 @@ class UTIL:
         self.financial = FinancialDataTool()
         self.sectool = SECFilingsTool()
         self.news = NewsScannerTool()
+        self.news_pipeline = NewsPipelineTool(self.news)
+        # Seen-article index behind watchlist/news_updates
+        self.watchlist = NewsWatchlist()
         self.mail_sender = MailSender()
         self.llm = GeminiAgent()
-        
-    def get_web_search(self,query:str):
+        # Model is loaded on the first sentiment call
+        self.sentiment = SentimentAnalyzerTool()
+        # Results of cacheable tools, kept for the TTL each tool declares
+        self.cache = ResultCache()
+        # Every @tool method below, keyed by its protocol name
+        self.registry = ToolRegistry.from_object(self)
+
+    @tool(
+        "websearch",
+        description="given tool searches about the company given in 'query' and gives a detail report. Mainly used for gathering online available data",
+        params=[
+            Param("query", normalize=normalize_query, required=False, description='proper query to ask search about a company. example = "Detail Company profile of <company name> company profile site:investopedia.com OR site:crunchbase.com OR site:forbes.com OR site:finance.yahoo.com OR site:sec.gov"'),
+            Param("queries", type="list", normalize=normalize_query, required=False, description=f'list of up to {SEARCH_MAX_QUERIES} queries searched concurrently in one call instead of "query", e.g. profile, leadership, controversies and competitors of a company. Returns [{{query, results}}, ...]'),
+        ],
+        kind=IO, cacheable=True, ttl=6 * 60 * 60,
+    )
+    def get_web_search(self,query:str=None, queries:list=None):
+        if queries:
+            answers = self.web_search.run_many(queries)
+            # A throttled or failed query must not blank its results for the whole TTL
+            return Uncacheable(answers) if any('error' in answer for answer in answers) else answers
+        if not query:
+            raise MissingParamError("websearch needs 'query' or 'queries'")
         result = self.web_search.run(query)
         return result
-    
-    def get_news(self,name:str):
-        result = self.news.run(name)
-        return result
-        
+
+    @async_variant(get_web_search)
+    async def get_web_search_async(self, query:str=None, queries:list=None):
+        if queries:
+            answers = await self.web_search.arun_many(queries)
+            return Uncacheable(answers) if any('error' in answer for answer in answers) else answers
+        if not query:
+            raise MissingParamError("websearch needs 'query' or 'queries'")
+        return await self.web_search.arun(query)
+
+    @tool(
+        "ticker_lookup",
+        description="This tool resolves a company name to its stock ticker and SEC CIK number. Returns {company, ticker, cik}, 'Unknown' when not found. Reference its output from financial_descriptor in the same batch.",
+        params=[Param("name", description="name of the company", normalize=normalize_company)],
+        kind=IO, cacheable=True, ttl=24 * 60 * 60,
+    )
+    def get_ticker(self, name:str):
+        info = self.ticker_manager.get_company_info(name)
+        if info is None:
+            info = self.ticker_manager.get_company_info(normalize_company(name))
+        info = info or {}
+        return {"company": name, "ticker": info.get("ticker", "Unknown"), "cik": info.get("cik", "Unknown")}
+
+    @tool(
+        "financial_descriptor",
+        description="This tool takes the company name and gives current and recent financial report of that company.",
+        params=[
+            Param("ticker", description="ticker symbol of the company", required=False, default="Unknown"),
+            Param("cik", description="cik number of the company", required=False, default="Unknown", normalize=normalize_cik),
+        ],
+        kind=IO, cacheable=True, ttl=24 * 60 * 60,
+    )
     def get_financial_data(self,ticker:str, cik:str):
+        print(f"Ticker: {ticker}, CIK: {cik}")
         fin = "No data"
         if ticker!="Unknown":
             fin = self.financial.run(ticker)
@@ -33,14 +94,137 @@ class UTIL:
         if cik!="Unknown":
             sec = self.sectool.run(cik)
         return fin+"\n\n"+sec
-        
+
+    @async_variant(get_financial_data)
+    async def get_financial_data_async(self, ticker:str, cik:str):
+        async def financials():
+            # yfinance has no async API, it runs on a thread while SEC is awaited
+            return await asyncio.to_thread(self.financial.run, ticker) if ticker!="Unknown" else "No data"
+
+        async def filings():
+            return await self.sectool.arun(cik) if cik!="Unknown" else "Not found"
+
+        fin, sec = await asyncio.gather(financials(), filings())
+        return fin+"\n\n"+sec
+
+    @tool(
+        "news",
+        description="This tool takes the company name and scans recent news articles related to lawsuits, fraud, or other risks for a given company.",
+        params=[Param("name", description="name of the company", normalize=normalize_company)],
+        kind=IO, cacheable=True, ttl=60 * 60,
+    )
+    def get_news(self,name:str):
+        result = self.news.run(name)
+        return result
+
+    @async_variant(get_news)
+    async def get_news_async(self, name:str):
+        return await self.news.arun(name)
+
+    @tool(
+        "news_pipeline",
+        description="This tool takes the company name and collects its recent news from all news sources at once (risk-focused web search, DuckDuckGo News, Google News), deduplicated and newest first. Returns [{title, url, snippet, sources, date, published_at}, ...]. Prefer it to several separate news calls.",
+        params=[
+            Param("name", description="name of the company", normalize=normalize_company),
+            Param("window", description=f"only news from this recent period, e.g. '24h', '7d', '1m' (default '{NEWS_WINDOW}')", required=False, default=NEWS_WINDOW, normalize=normalize_window),
+        ],
+        kind=IO, cacheable=True, ttl=60 * 60,
+    )
+    def get_news_pipeline(self, name:str, window:str=NEWS_WINDOW):
+        articles, failed = self.news_pipeline.run(name, window)
+        # A throttled or failed source must not shrink the news for the whole TTL
+        return Uncacheable(articles) if failed else articles
+
+    @tool(
+        "watchlist",
+        description="Manages the companies whose news is monitored in the background. action is 'add', 'remove' or 'list'; 'list' returns [{name, last_scan_at, pending}, ...] where pending counts the new articles not yet read.",
+        params=[
+            Param("action", description="'add', 'remove' or 'list'"),
+            Param("name", description="name of the company, needed by 'add' and 'remove'", normalize=normalize_company, required=False),
+        ],
+        kind=IO,
+    )
+    def manage_watchlist(self, action:str, name:str=None):
+        action = action.strip().lower()
+        if action == "list":
+            return self.watchlist.companies()
+        if action not in ("add", "remove"):
+            raise ValueError(f"Unknown watchlist action '{action}', expected 'add', 'remove' or 'list'")
+        if not name:
+            raise MissingParamError(f"watchlist action '{action}' needs 'name'")
+        if action == "add":
+            added = self.watchlist.add(name)
+            return f"{name} added to the watchlist" if added else f"{name} is already on the watchlist"
+        removed = self.watchlist.remove(name)
+        return f"{name} removed from the watchlist" if removed else f"{name} is not on the watchlist"
+
+    @tool(
+        "news_updates",
+        description="Returns only the risk news articles found since the last call, for the company in 'name' (which is added to the watchlist) or for the whole watchlist when no name is given. Returns [{company, title, url, snippet, first_seen_at}, ...], newest first. Use it instead of 'news' to follow up on companies already investigated.",
+        params=[Param("name", description="name of the company", normalize=normalize_company, required=False)],
+        kind=IO,
+    )
+    def news_updates(self, name:str=None):
+        return self.watchlist.updates(self.news, name)
+
+    @tool(
+        "sentiment",
+        description=f"This tool scores the sentiment of a 'text', or of up to {SENTIMENT_MAX_TEXTS} 'texts' at once (e.g. every news snippet of an investigation). Long texts are scored whole. Returns {{label, score, chunks}}, a list of them for 'texts'.",
+        params=[
+            Param("text", description="text to score", required=False),
+            Param("texts", type="list", description="list of texts scored in one call instead of 'text'", required=False),
+        ],
+        kind=CPU, cacheable=True, ttl=7 * 24 * 60 * 60,
+    )
+    def get_sentiment(self, text:str=None, texts:list=None):
+        if texts:
+            if len(texts) > SENTIMENT_MAX_TEXTS:
+                raise ValueError(f"At most {SENTIMENT_MAX_TEXTS} texts per call, got {len(texts)}")
+            return self.sentiment.run_batch(texts)
+        if not text:
+            raise MissingParamError("sentiment needs 'text' or 'texts'")
+        return self.sentiment.run(text)
+
+    @tool(
+        "send_mail",
+        description="This tool sends a designated to send a mail to a designated sender.",
+        params=[
+            Param("subject", description="Subject of the mail"),
+            Param("message", description="The actual mail body"),
+            Param("receiver", description="email or name of receiver"),
+        ],
+        kind=IO, max_concurrency=1,  # one SMTP connection is shared by all calls
+    )
     def send_mail(self, subject:str, message:str, receiver:str):
-        return self.mail_sender.sendMail(subject=subject, message=message, dest=receiver)       
-            
+        return self.mail_sender.sendMail(subject=subject, message=message, dest=receiver)
+
+    @tool(
+        "gemini",
+        description="This tool sends the given 'query' to the Gemini LLM and returns the generated answer.",
+        params=[Param("query", description="prompt for the LLM")],
+        kind=IO, timeout=120,
+    )
+    def ask_llm(self, query:str):
+        return self.llm.run(query)
+
+    @async_variant(ask_llm)
+    async def ask_llm_async(self, query:str):
+        return await self.llm.arun(query)
+
+    @tool("list", description="Lists the available tools.", listed=False)
+    def list_tools(self):
+        return self.registry.describe()
+
+    @tool("pdf_analysis", description="Analyzes an uploaded PDF report.", listed=False)
+    def pdf_analysis(self):
+        # This would be called from the web interface
+        # The actual file upload happens via the separate endpoint
+        return {"message": "Use /upload-pdf endpoint for PDF analysis"}
+
     def analyze_pdf(self, file_input, analysis_type="comprehensive"):
         """
         Analyze uploaded PDF report
-        
+
         Args:
             file_input: Flask FileStorage object
             analysis_type: 'comprehensive', 'financial', or 'summary'
@@ -0,0 +1,267 @@
+# server/jobs.py
+
+"""
+Background job queue for long-running work (PDF analysis, slow LLM calls).
+
+A submitted job is written to a SQLite table and handed to a bounded worker
+pool; the caller gets the job id back immediately and polls for the status and
+result. Because every job is persisted before it runs, jobs that were queued or
+running when the process died are picked up again on the next start. Finished
+jobs are kept for a retention window and then purged.
+
+One JobQueue should own a given database file at a time.
+"""
+
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from werkzeug.datastructures import FileStorage
+
+from shared.config import JOBS_DB, JOB_WORKERS, JOB_MAX_PENDING, JOB_RETENTION, JOB_MAX_ATTEMPTS, JOB_SPOOL_DIR
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFullError(RuntimeError):
+    """Raised by submit when JOB_MAX_PENDING jobs are already waiting"""
+
+
+class JobQueue:
+    def __init__(self, db_file: str = JOBS_DB, workers: int = JOB_WORKERS,
+                 max_pending: int = JOB_MAX_PENDING, retention: float = JOB_RETENTION,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, spool_dir: str = JOB_SPOOL_DIR):
+        """
+        Args:
+            db_file : SQLite file the jobs are persisted in
+            workers : size of the background worker pool
+            max_pending : queued + running jobs accepted before submit refuses new ones
+            retention : seconds a finished job stays available for polling
+            max_attempts : times a job is started before it is failed, bounds crash loops
+            spool_dir : directory uploaded files are kept in until their job has run
+        """
+        self.max_pending = max_pending
+        self.retention = retention
+        self.max_attempts = max_attempts
+        self.spool_dir = spool_dir
+        self.handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._started = False
+
+        directory = os.path.dirname(db_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        os.makedirs(spool_dir, exist_ok=True)
+        # Shared by the request and worker threads, every access goes through self._lock
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._create_table()
+
+    def _create_table(self):
+        try:
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            );
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, finished_at)")
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"[JobQueue] Database error: {e}")
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any]], Any]):
+        """
+        Declares how jobs of a kind are executed.
+
+        Args:
+            kind : job kind given to submit, e.g. "batch" or "pdf"
+            handler : called with the job payload on a worker thread, returns a JSON serializable result
+        """
+        self.handlers[kind] = handler
+
+    def start(self):
+        """
+        Requeues the jobs left unfinished by a previous process and starts
+        running them. Call once every handler is registered.
+        """
+        if self._started:
+            return
+        self._started = True
+        self.purge_expired()
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+            self.conn.execute("UPDATE jobs SET status = ? WHERE status = ?", (QUEUED, RUNNING))
+            self.conn.commit()
+        if rows:
+            print(f"[JobQueue] Resuming {len(rows)} unfinished job(s)")
+        for row in rows:
+            self.executor.submit(self._execute, row["id"])
+
+    def submit(self, kind: str, payload: Dict[str, Any]) -> str:
+        """Persists a job and queues it, returns the job id"""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            pending = self.conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchone()[0]
+            if pending >= self.max_pending:
+                raise QueueFullError(f"{pending} jobs are already pending, try again later")
+            self.conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), QUEUED, time.time()),
+            )
+            self.conn.commit()
+        if self._started:
+            self.executor.submit(self._execute, job_id)
+        return job_id
+
+    def spool(self, data: bytes, suffix: str = "") -> str:
+        """Writes an upload to the spool directory so a job can read it later, returns its path"""
+        path = os.path.join(self.spool_dir, f"{uuid.uuid4().hex}{suffix}")
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def _execute(self, job_id: str):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT kind, payload, status, attempts FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None or row["status"] != QUEUED:
+                return
+            attempts = row["attempts"] + 1
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, started_at = ? WHERE id = ?",
+                (RUNNING, attempts, time.time(), job_id),
+            )
+            self.conn.commit()
+
+        payload = json.loads(row["payload"])
+        if attempts > self.max_attempts:
+            self._finish(job_id, payload, error=f"Gave up after {self.max_attempts} attempts")
+            return
+        handler = self.handlers.get(row["kind"])
+        if handler is None:
+            self._finish(job_id, payload, error=f"Unknown job kind '{row['kind']}'")
+            return
+        try:
+            result = handler(payload)
+        except Exception as e:
+            print(f"[JobQueue] Job {job_id} failed: {e}")
+            self._finish(job_id, payload, error=str(e))
+            return
+        self._finish(job_id, payload, result=result)
+
+    def _finish(self, job_id, payload, result=None, error=None):
+        status = FAILED if error is not None else DONE
+        try:
+            encoded = json.dumps(result)
+        except (TypeError, ValueError) as e:
+            status, encoded, error = FAILED, None, f"Result is not JSON serializable: {e}"
+        with self._lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, encoded, error, time.time(), job_id),
+            )
+            self.conn.commit()
+        self._remove_spooled(payload)
+        self.purge_expired()
+
+    @staticmethod
+    def _remove_spooled(payload):
+        path = payload.get("path") if isinstance(payload, dict) else None
+        if path and os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"[JobQueue] Could not remove {path}: {e}")
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a job, with its result or error once finished. None if unknown or expired."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT id, kind, status, result, error, created_at, started_at, finished_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        if row["finished_at"] and row["finished_at"] + self.retention <= time.time():
+            return None
+        job = {
+            "id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+        if row["status"] == DONE:
+            job["result"] = json.loads(row["result"])
+        elif row["status"] == FAILED:
+            job["error"] = row["error"]
+        return job
+
+    def purge_expired(self) -> int:
+        """Drops finished jobs older than the retention window, returns how many were removed"""
+        cutoff = time.time() - self.retention
+        with self._lock:
+            try:
+                cursor = self.conn.execute(
+                    "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at <= ?", (DONE, FAILED, cutoff)
+                )
+                self.conn.commit()
+                return cursor.rowcount
+            except sqlite3.Error as e:
+                print(f"[JobQueue] Failed to purge: {e}")
+                return 0
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.conn.close()
+
+
+def create_job_queue(dispatcher, **kwargs) -> JobQueue:
+    """
+    JobQueue wired to a Dispatcher, shared by both serving modes.
+
+    Job kinds:
+        batch : a /requests batch, the result is the usual response document
+        pdf : {"path", "filename", "analysis_type"} of a spooled upload, the result is the /upload-pdf response
+    """
+    queue = JobQueue(**kwargs)
+    queue.register("batch", dispatcher.handle_batch)
+
+    def analyze_spooled_pdf(payload):
+        with open(payload["path"], "rb") as f:
+            data = f.read()
+        # PDFReader works on werkzeug's FileStorage, same as the /upload-pdf endpoint
+        file = FileStorage(stream=io.BytesIO(data), filename=payload["filename"], content_type="application/pdf")
+        return dispatcher.util.analyze_pdf(file, payload.get("analysis_type", "comprehensive"))
+
+    queue.register("pdf", analyze_spooled_pdf)
+    queue.start()
+    return queue
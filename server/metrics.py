@@ -0,0 +1,186 @@
+# server/metrics.py
+
+"""
+Process-wide server metrics rendered in the Prometheus text exposition format.
+
+Records per-tool call counts, error counts and latency histograms (from the
+Dispatcher), upstream retries, rate scheduler waits/refusals and circuit
+breaker states and hedging outcomes (from the tools). Cache hit ratios and coalescing counters are
+read from the ResultCache / SingleFlight at render time.
+"""
+
+import threading
+from collections import defaultdict
+
+PREFIX = "autoinvestigator"
+# Upper bounds in seconds, tuned for upstream APIs that answer in 0.1s - 60s
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _labels(**labels) -> str:
+    parts = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class Metrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._calls = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._bucket_counts = defaultdict(lambda: [0] * len(self.buckets))
+        self._latency_sum = defaultdict(float)
+        self._observed = defaultdict(int)   # calls with a latency sample, i.e. not timed out
+        self._retries = defaultdict(int)
+        self._throttled = defaultdict(int)
+        self._rate_wait = defaultdict(float)
+        self._circuit_open = {}
+        self._hedges = defaultdict(int)
+        self._hedge_wins = defaultdict(int)
+
+    def observe_call(self, tool: str, seconds: float, error: bool = False):
+        """Records one finished tool call"""
+        with self._lock:
+            self._calls[tool] += 1
+            if error:
+                self._errors[tool] += 1
+            self._latency_sum[tool] += seconds
+            self._observed[tool] += 1
+            counts = self._bucket_counts[tool]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+
+    def observe_timeout(self, tool: str):
+        """A call that did not finish in time: counted as a call and an error, no latency sample"""
+        with self._lock:
+            self._calls[tool] += 1
+            self._errors[tool] += 1
+
+    def inc_retry(self, upstream: str):
+        """Called by tools every time they retry an upstream API"""
+        with self._lock:
+            self._retries[upstream] += 1
+
+    def inc_throttled(self, upstream: str):
+        """A call refused by the rate scheduler because the upstream budget is exhausted"""
+        with self._lock:
+            self._throttled[upstream] += 1
+
+    def observe_rate_wait(self, upstream: str, seconds: float):
+        """Time a call was queued by the rate scheduler before reaching the upstream"""
+        with self._lock:
+            self._rate_wait[upstream] += seconds
+
+    def set_circuit_open(self, upstream: str, is_open: bool):
+        """Called by the circuit breakers when an upstream's circuit opens or closes"""
+        with self._lock:
+            self._circuit_open[upstream] = 1 if is_open else 0
+
+    def inc_hedge(self, name: str):
+        """A hedged call whose primary was slow enough to fire the secondary"""
+        with self._lock:
+            self._hedges[name] += 1
+
+    def inc_hedge_win(self, name: str, winner: str):
+        """Which side ('primary' or 'secondary') answered a hedged call first"""
+        with self._lock:
+            self._hedge_wins[(name, winner)] += 1
+
+    def render(self, cache_stats: dict = None, singleflight=None) -> str:
+        """
+        Renders every metric in the text exposition format.
+
+        Args:
+            cache_stats : ResultCache.stats()
+            singleflight : SingleFlight of the dispatcher
+        """
+        lines = []
+        with self._lock:
+            lines.append(f"# HELP {PREFIX}_tool_calls_total Tool calls handled, by tool.")
+            lines.append(f"# TYPE {PREFIX}_tool_calls_total counter")
+            for tool, count in sorted(self._calls.items()):
+                lines.append(f"{PREFIX}_tool_calls_total{_labels(tool=tool)} {count}")
+
+            lines.append(f"# HELP {PREFIX}_tool_errors_total Tool calls that raised or timed out, by tool.")
+            lines.append(f"# TYPE {PREFIX}_tool_errors_total counter")
+            for tool in sorted(self._calls):
+                lines.append(f"{PREFIX}_tool_errors_total{_labels(tool=tool)} {self._errors[tool]}")
+
+            lines.append(f"# HELP {PREFIX}_tool_latency_seconds Latency of finished tool calls, by tool.")
+            lines.append(f"# TYPE {PREFIX}_tool_latency_seconds histogram")
+            for tool, counts in sorted(self._bucket_counts.items()):
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f"{PREFIX}_tool_latency_seconds_bucket{_labels(tool=tool, le=bound)} {count}")
+                lines.append(f"{PREFIX}_tool_latency_seconds_bucket{_labels(tool=tool, le='+Inf')} {self._observed[tool]}")
+                lines.append(f"{PREFIX}_tool_latency_seconds_sum{_labels(tool=tool)} {self._latency_sum[tool]:.6f}")
+                lines.append(f"{PREFIX}_tool_latency_seconds_count{_labels(tool=tool)} {self._observed[tool]}")
+
+            lines.append(f"# HELP {PREFIX}_upstream_retries_total Retries of upstream API calls, by upstream.")
+            lines.append(f"# TYPE {PREFIX}_upstream_retries_total counter")
+            for upstream, count in sorted(self._retries.items()):
+                lines.append(f"{PREFIX}_upstream_retries_total{_labels(upstream=upstream)} {count}")
+
+            lines.append(f"# HELP {PREFIX}_upstream_throttled_total Calls refused by the rate scheduler, by upstream.")
+            lines.append(f"# TYPE {PREFIX}_upstream_throttled_total counter")
+            for upstream, count in sorted(self._throttled.items()):
+                lines.append(f"{PREFIX}_upstream_throttled_total{_labels(upstream=upstream)} {count}")
+
+            lines.append(f"# HELP {PREFIX}_upstream_rate_wait_seconds_total Time calls were queued by the rate scheduler, by upstream.")
+            lines.append(f"# TYPE {PREFIX}_upstream_rate_wait_seconds_total counter")
+            for upstream, seconds in sorted(self._rate_wait.items()):
+                lines.append(f"{PREFIX}_upstream_rate_wait_seconds_total{_labels(upstream=upstream)} {seconds:.6f}")
+
+            lines.append(f"# HELP {PREFIX}_circuit_open Whether the circuit breaker of an upstream is open.")
+            lines.append(f"# TYPE {PREFIX}_circuit_open gauge")
+            for upstream, value in sorted(self._circuit_open.items()):
+                lines.append(f"{PREFIX}_circuit_open{_labels(upstream=upstream)} {value}")
+
+            lines.append(f"# HELP {PREFIX}_hedges_total Hedged calls that fired their secondary provider.")
+            lines.append(f"# TYPE {PREFIX}_hedges_total counter")
+            for name, count in sorted(self._hedges.items()):
+                lines.append(f"{PREFIX}_hedges_total{_labels(call=name)} {count}")
+
+            lines.append(f"# HELP {PREFIX}_hedge_wins_total Side that answered a call with both providers in flight.")
+            lines.append(f"# TYPE {PREFIX}_hedge_wins_total counter")
+            for (name, winner), count in sorted(self._hedge_wins.items()):
+                lines.append(f"{PREFIX}_hedge_wins_total{_labels(call=name, winner=winner)} {count}")
+
+        if cache_stats is not None:
+            tools = cache_stats.get("tools", {})
+            lines.append(f"# HELP {PREFIX}_cache_hits_total Result cache hits, by tool and tier.")
+            lines.append(f"# TYPE {PREFIX}_cache_hits_total counter")
+            for tool, counts in sorted(tools.items()):
+                lines.append(f"{PREFIX}_cache_hits_total{_labels(tool=tool, tier='memory')} {counts['memory_hits']}")
+                lines.append(f"{PREFIX}_cache_hits_total{_labels(tool=tool, tier='disk')} {counts['disk_hits']}")
+            lines.append(f"# HELP {PREFIX}_cache_misses_total Result cache misses, by tool.")
+            lines.append(f"# TYPE {PREFIX}_cache_misses_total counter")
+            for tool, counts in sorted(tools.items()):
+                lines.append(f"{PREFIX}_cache_misses_total{_labels(tool=tool)} {counts['misses']}")
+            lines.append(f"# HELP {PREFIX}_cache_hit_ratio Share of lookups served from the result cache, by tool.")
+            lines.append(f"# TYPE {PREFIX}_cache_hit_ratio gauge")
+            for tool, counts in sorted(tools.items()):
+                hits = counts["memory_hits"] + counts["disk_hits"]
+                lookups = hits + counts["misses"]
+                lines.append(f"{PREFIX}_cache_hit_ratio{_labels(tool=tool)} {hits / lookups if lookups else 0:.6f}")
+            lines.append(f"# HELP {PREFIX}_cache_memory_entries Entries in the in-memory cache tier.")
+            lines.append(f"# TYPE {PREFIX}_cache_memory_entries gauge")
+            lines.append(f"{PREFIX}_cache_memory_entries {cache_stats.get('memory_entries', 0)}")
+
+        if singleflight is not None:
+            lines.append(f"# HELP {PREFIX}_coalesced_calls_total Calls served by an identical in-flight call.")
+            lines.append(f"# TYPE {PREFIX}_coalesced_calls_total counter")
+            lines.append(f"{PREFIX}_coalesced_calls_total {singleflight.shared}")
+            lines.append(f"# HELP {PREFIX}_inflight_calls Distinct coalescable calls currently running.")
+            lines.append(f"# TYPE {PREFIX}_inflight_calls gauge")
+            lines.append(f"{PREFIX}_inflight_calls {singleflight.in_flight()}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Shared by the dispatcher and the tools
+metrics = Metrics()
@@ -1,4 +1,5 @@
 from server.tool_descriptor import get_tool_description
+from server.tools.registry import ToolRegistry, ToolSpec
 
 TOOL_DESCRIPTION = get_tool_description()
 
@@ -49,6 +50,15 @@ BASIC_RESPONSE_TEMPLATE="""
 }
 """
 
+REFERENCE_NOTE = """
+A param value may be the output of another request in the same payload instead of a literal:
+    {"$ref": "<request_id>", "path": "<field of that request's result>"}
+The server runs the referenced request first. For example, to get the financials of a company
+known only by name, call "ticker_lookup" with id "t1" and pass
+"ticker": {"$ref": "t1", "path": "ticker"} and "cik": {"$ref": "t1", "path": "cik"} to "financial_descriptor".
+Do not reference a request from itself or in a circle.
+"""
+
 BASIC_PROMPT=f"""You are an intelligent agent system equipped with the following tools. Based on a user's query, you must generate a structured list of tool calls in JSON format. Each call must include the tool method, required parameters, and a unique request ID. All requests will be sent together in a single JSON payload.
 
 Here are the available tools:
@@ -59,5 +69,13 @@ Your task is: **Given a user's natural language query, generate a structured too
 ```json
 {BASIC_REQUEST_TEMPLATE}
 ```
+{REFERENCE_NOTE}
 **User Query** :
 """
+
+
+# Prompts served under "prompt/<name>"
+PROMPTS = ToolRegistry()
+PROMPTS.register(ToolSpec("request_template", description="Request format the LLM must produce"), lambda: BASIC_REQUEST_TEMPLATE)
+PROMPTS.register(ToolSpec("main_prompt", description="Planner prompt with the tool description"), lambda: BASIC_PROMPT)
+PROMPTS.register(ToolSpec("list", description="Lists the available prompts", expand_results=True), lambda: PROMPTS.names())
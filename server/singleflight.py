@@ -0,0 +1,90 @@
+# server/singleflight.py
+
+"""
+In-flight deduplication of identical tool calls.
+
+While a call for a key is running, every other caller asking for the same key
+waits for that execution and receives its result (or exception) instead of
+hitting the upstream API again. Works across threads (Flask mode) and on the
+event loop (ASGI mode) through the same table of futures.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Dict
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self.executions = 0   # calls that actually ran
+        self.shared = 0       # calls served by another caller's execution
+
+    def _join(self, key):
+        """Returns (future, is_leader) for a key"""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            self.executions += 1
+            return future, True
+
+    def _leave(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    @staticmethod
+    def _settle(future: Future, result=None, error: BaseException = None):
+        """Completes the shared future once; a future already done is left as it is"""
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, fn, *args, **kwargs):
+        """Runs fn(*args, **kwargs) unless a call with the same key is in flight, then waits for it"""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._settle(future, error=e)
+            raise
+        else:
+            self._settle(future, result)
+            return result
+        finally:
+            self._leave(key)
+
+    async def ado(self, key: str, coro_fn, *args, **kwargs):
+        """Event-loop version of do, coro_fn must return an awaitable"""
+        future, leader = self._join(key)
+        if not leader:
+            # shield: a waiter that times out or is cancelled must not cancel the shared future
+            return await asyncio.shield(asyncio.wrap_future(future))
+        try:
+            result = await coro_fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            # The leader timed out or its client left; the waiters still get an answer
+            self._settle(future, error=RuntimeError("Shared call was cancelled before it completed"))
+            raise
+        except BaseException as e:
+            self._settle(future, error=e)
+            raise
+        else:
+            self._settle(future, result)
+            return result
+        finally:
+            self._leave(key)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._inflight)
@@ -13,13 +13,17 @@ class FinancialDataTool:
         
         Args:
             ticker : Ticker of the app.
+
+        Raises:
+            the Yahoo Finance error, so a failed fetch is not cached as the answer
         """
         print(f"[FinancialDataTool] Fetching financials for {ticker}")
         stock = yf.Ticker(ticker)
         try:
             info = stock.info
-        except Exception:
-            return f"Failed to fetch data for {ticker}."
+        except Exception as e:
+            print(f"[FinancialDataTool] Failed to fetch data for {ticker}: {e}")
+            raise
 
         name = info.get("longName", "N/A")
         sector = info.get("sector", "N/A")
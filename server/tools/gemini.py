@@ -3,6 +3,7 @@ import os
 import google.generativeai as genai
 from shared.config import GEMINI_MODEL
 from shared import config
+from server.tools.rate_limiter import rate_limits
 
 class GeminiAgent(object):
     def __new__(cls):
@@ -32,6 +33,8 @@ class GeminiAgent(object):
         if not self.model:
             return "Error: Gemini Agent not initialized correctly."
 
+        # Raises RateLimitExceeded instead of spending a request that would get a 429
+        rate_limits.acquire("gemini")
         try:
             print(f"[GeminiAgent] Generating content...")
             response = self.model.generate_content(query)
@@ -39,3 +42,19 @@ class GeminiAgent(object):
         except Exception as e:
             print(f"[GeminiAgent] An error occurred while generating content: {e}")
             return f"Error from Gemini API: {e}"
+
+    async def arun(self, query:str) -> str:
+        """
+        Event-loop version of run, awaits the Gemini API instead of blocking a thread.
+        """
+        if not self.model:
+            return "Error: Gemini Agent not initialized correctly."
+
+        await rate_limits.aacquire("gemini")
+        try:
+            print(f"[GeminiAgent] Generating content (async)...")
+            response = await self.model.generate_content_async(query)
+            return response.text
+        except Exception as e:
+            print(f"[GeminiAgent] An error occurred while generating content: {e}")
+            return f"Error from Gemini API: {e}"
@@ -1,34 +1,61 @@
 # server/tools/news_aggregator.py
 
 import os
-import requests
+from shared.config import SERP_URL
+from shared.http import http_session
+from server.tools.rate_limiter import rate_limits
+from server.tools.resilience import RetryPolicy, circuit_breaker
+from server.tools.result_merger import SearchResult, merge_results, format_results
+from server.tools.web_search import serp_time_filter
 
 class NewsAggregatorTool:
     def __init__(self):
         self.api_key = os.getenv("SERP_KEY")
         if not self.api_key:
             raise EnvironmentError("SERP_KEY is not set")
+        self.retry = RetryPolicy("serpapi", breaker=circuit_breaker("serpapi"))
 
-    def run(self, company_name: str) -> str:
+    def search(self, company_name: str, window=None, num_results: int = 10):
+        """
+        Latest news about the company from Google News through SerpAPI.
+
+        Args:
+            company_name : name of the company
+            window : only articles from this recent period, e.g. "7d" (default no restriction)
+            num_results : maximum number of articles
+
+        Returns:
+            list of SearchResult with source "serpapi_news"
+        """
         print(f"[NewsAggregatorTool] Fetching news for: {company_name}")
         params = {
             "q": f"{company_name} latest news",
             "api_key": self.api_key,
             "engine": "google",
             "tbm": "nws",  
-            "num": 5
+            "num": num_results
         }
+        tbs = serp_time_filter(window)
+        if tbs:
+            params["tbs"] = tbs
+
+        def search():
+            rate_limits.acquire("serpapi")
+            response = http_session().get(SERP_URL, params=params)
+            response.raise_for_status()
+            return response.json()
 
-        response = requests.get("https://serpapi.com/search", params=params)
-        results = response.json()
+        results = self.retry.call(search)
 
-        news_items = []
-        for article in results.get("news_results", []):
-            title = article.get("title")
-            snippet = article.get("snippet")
-            link = article.get("link")
-            date = article.get("date")
-            if snippet:
-                news_items.append(f"{title} ({date})\n{snippet}\n[Link]({link})")
+        return [
+            SearchResult(article.get("title", ""), article.get("snippet"), article.get("link", ""),
+                         "serpapi_news", rank, article.get("date"))
+            for rank, article in enumerate(results.get("news_results", []))
+            if article.get("snippet")
+        ]
 
-        return "\n\n".join(news_items) if news_items else "No recent news found."
+    def run(self, company_name: str, window=None) -> str:
+        news_items = self.search(company_name, window, num_results=5)
+        if not news_items:
+            return "No recent news found."
+        return format_results([item.to_dict() for item in merge_results([news_items])])
@@ -0,0 +1,102 @@
+# server/tools/news_pipeline.py
+
+"""
+One-call news pipeline over every configured news source.
+
+The risk-focused web search of NewsScannerTool, DuckDuckGo News and, when
+SERP_KEY is set, SerpAPI Google News are queried concurrently for the same
+time window. Their results go through result_merger, so an article reported
+by several sources appears once, and come back newest first with a
+normalized publication time.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from server.tools.news_aggregator import NewsAggregatorTool
+from server.tools.news_scanner import NewsScannerTool
+from server.tools.rate_limiter import RateLimitExceeded
+from server.tools.resilience import CircuitOpenError
+from server.tools.result_merger import merge_results, published_at
+from shared.config import SERP_KEY, NEWS_WINDOW, NEWS_MAX_ITEMS, NEWS_SOURCE_WORKERS
+from shared.utils import window_seconds
+
+# Shared by every call, so concurrent batches cannot start unbounded source queries
+_source_pool = ThreadPoolExecutor(max_workers=NEWS_SOURCE_WORKERS, thread_name_prefix="news-source")
+
+# Relative dates ("2 days ago") and day-only dates are approximate
+_WINDOW_SLACK = 86400
+
+
+class NewsPipelineTool:
+    def __init__(self, scanner: NewsScannerTool = None):
+        """
+        Args:
+            scanner : NewsScannerTool to reuse, a new one by default
+        """
+        self.scanner = scanner or NewsScannerTool()
+        self.aggregator = NewsAggregatorTool() if os.getenv(SERP_KEY) else None
+
+    def sources(self, company_name: str, window):
+        """Source name -> callable returning a SearchResult list"""
+        sources = {
+            "web_search": lambda: self.scanner.search_results(company_name, window),
+            "duckduckgo_news": lambda: self.scanner.ddg_results(company_name, window),
+        }
+        if self.aggregator:
+            sources["serpapi_news"] = lambda: self.aggregator.search(company_name, window)
+        return sources
+
+    def run(self, company_name: str, window=NEWS_WINDOW, limit: int = NEWS_MAX_ITEMS):
+        """
+        Queries all news sources concurrently and merges their articles.
+
+        Args:
+            company_name : name of the company
+            window : only articles from this recent period, e.g. "24h", "7d", "1m"; empty for no restriction
+            limit : maximum number of articles
+
+        Returns:
+            (articles, failed): articles is [{title, url, snippet, sources, score, date, published_at}, ...],
+            newest first, articles without a readable date last, best ranked first; failed lists
+            the sources that could not answer (UTIL.get_news_pipeline keeps such a partial
+            answer out of the result cache)
+
+        Raises:
+            the error of a source when every source failed, e.g. RateLimitExceeded
+        """
+        seconds = window_seconds(window)   # invalid windows fail before any source is queried
+        print(f"[NewsPipelineTool] Fetching news for {company_name} (window {window or 'none'})")
+        futures = {name: _source_pool.submit(fn) for name, fn in self.sources(company_name, window).items()}
+
+        result_lists, errors, failed = [], [], []
+        for name, future in futures.items():
+            try:
+                result_lists.append(future.result())
+            except Exception as e:
+                # One source down or throttled: the others still answer
+                print(f"[NewsPipelineTool] {name} failed: {e}")
+                errors.append(e)
+                failed.append(name)
+        if not result_lists:
+            limited = [e for e in errors if isinstance(e, (RateLimitExceeded, CircuitOpenError))]
+            raise (limited or errors)[0]
+
+        now = time.time()
+        oldest = now - seconds - _WINDOW_SLACK if seconds else None
+        dated, undated = [], []
+        for merged in merge_results(result_lists):
+            timestamp = published_at(merged.date, now)
+            if timestamp is not None and oldest is not None and timestamp < oldest:
+                continue
+            item = merged.to_dict()
+            if timestamp is None:
+                item["published_at"] = None
+                undated.append(item)
+            else:
+                item["published_at"] = datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec="seconds")
+                dated.append((timestamp, item))
+        dated.sort(key=lambda pair: pair[0], reverse=True)
+        return ([item for _, item in dated] + undated)[:limit], failed
@@ -2,7 +2,11 @@
 
 from duckduckgo_search import DDGS
 from shared.config import REGION,SAFE_SEARCH, TIME_LIMIT, MAX_RESULTS
+from shared.utils import window_seconds
 from .web_search import WebSearchTool
+from .rate_limiter import rate_limits
+from .resilience import RetryPolicy, circuit_breaker
+from .result_merger import SearchResult
 
 class NewsScannerTool:
     """
@@ -10,26 +14,74 @@ class NewsScannerTool:
     """
     def __init__(self):
         self.web_search = WebSearchTool()
+        self.ddg_retry = RetryPolicy("duckduckgo", breaker=circuit_breaker("duckduckgo"))
 
-    def run(self, company_name: str):
+    @staticmethod
+    def query(company_name: str) -> str:
+        return f'{company_name} lawsuit fraud OR scandal OR investigation OR controversy'
+
+    def search_results(self, company_name: str, window=None):
+        """Raw SearchResult list of the risk-focused web search, see WebSearchTool.search_results"""
+        return self.web_search.search_results(self.query(company_name), window=window)
+
+    def ddg_results(self, company_name: str, window=TIME_LIMIT):
+        """
+        Recent news about the company from DuckDuckGo News, which needs no API key.
+
+        Args:
+            company_name : name of the company
+            window : e.g. "7d", rounded up to the day/week/month/year periods DuckDuckGo offers
+
+        Returns:
+            list of SearchResult with source "duckduckgo_news"
+        """
+        seconds = window_seconds(window)
+        timelimit = None
+        if seconds:
+            timelimit = next((limit for limit, length in (("d", 86400), ("w", 7 * 86400), ("m", 31 * 86400))
+                              if seconds <= length), "y")
+        print(f"[NewsScannerTool] Searching DuckDuckGo News for {company_name}")
+
+        def search():
+            rate_limits.acquire("duckduckgo")
+            return DDGS().news(company_name, region=REGION, safesearch=SAFE_SEARCH,
+                               timelimit=timelimit, max_results=MAX_RESULTS)
+
+        return [
+            SearchResult(article.get("title", ""), article.get("body", ""), article.get("url", ""),
+                         "duckduckgo_news", rank, article.get("date"))
+            for rank, article in enumerate(self.ddg_retry.call(search) or [])
+        ]
+
+    def run(self, company_name: str, window=None):
         """
         Runs a risk-focused news search for a given company.
         
         Args:
             company_name (str): The name of the company to search for.
+            window (str): Only articles from this recent period, e.g. "7d" (default no restriction).
             
         Returns:
-            list: A list of search result strings, or an empty list if an error occurs.
+            list: Deduplicated results [{title, url, snippet, sources, score}, ...].
+
+        Raises:
+            the search error, e.g. RateLimitExceeded when the Google CSE and SerpAPI budgets are both
+            exhausted: an empty list would be cached by the news tool and stamp a watchlist scan as done.
         """
-        query = f'{company_name} lawsuit fraud OR scandal OR investigation OR controversy'
         print(f"[NewsScannerTool] Searching risk-related news for {company_name}")
         try:
-            # The WebSearchTool's run method now returns the results directly
-            results = self.web_search.run(query)
+            results = self.web_search.search(self.query(company_name), window=window)
             return results
         except Exception as e:
-            # Catch the API quota error (and any other errors) gracefully
+            # The dispatcher reports it as the error of this call, the calling agent does not crash
+            print(f"[NewsScannerTool] An error occurred: {e}")
+            raise
+
+    async def arun(self, company_name: str, window=None):
+        """Event-loop version of run"""
+        print(f"[NewsScannerTool] Searching risk-related news for {company_name}")
+        try:
+            return await self.web_search.asearch(self.query(company_name), window=window)
+        except Exception as e:
             print(f"[NewsScannerTool] An error occurred: {e}")
-            print("[NewsScannerTool] This may be due to the Google Search API daily quota being exceeded.")
-            # Return an empty list to prevent the calling agent from crashing
-            return []
+            raise
@@ -0,0 +1,231 @@
+# server/tools/news_watchlist.py
+
+"""
+Incremental news monitoring for a watchlist of companies.
+
+Every scan runs the risk news search of NewsScannerTool for a company and
+records each article (by canonical URL, or by a digest of its snippet when it
+has no URL) in a local SQLite index. Only articles the index has not seen
+before are stored as new; `updates` hands them out once and marks them
+delivered, so the same story is not re-read and re-summarized every day.
+`WatchlistMonitor` rescans the watchlist in the background.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from server.tools.result_merger import canonical_url
+from shared.config import WATCHLIST_DB, WATCHLIST_SCAN_INTERVAL, WATCHLIST_MIN_RESCAN, WATCHLIST_POLL, WATCHLIST_UPDATES_BUDGET
+from shared.utils import normalize_company, normalize_text
+
+
+def article_key(item: Dict) -> str:
+    """Identity of an article in the seen index"""
+    url = canonical_url(item.get("url", ""))
+    if url:
+        return url
+    return "sha1:" + hashlib.sha1(normalize_text(item.get("snippet", "")).encode("utf-8")).hexdigest()
+
+
+class NewsWatchlist:
+    def __init__(self, db_file: str = WATCHLIST_DB):
+        # Shared by the worker threads and the monitor, every access goes through self._lock
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._create_tables()
+
+    def _create_tables(self):
+        try:
+            self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS watchlist (
+                company TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                added_at REAL NOT NULL,
+                last_scan_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS articles (
+                company TEXT NOT NULL,
+                key TEXT NOT NULL,
+                title TEXT,
+                url TEXT,
+                snippet TEXT,
+                first_seen_at REAL NOT NULL,
+                delivered_at REAL,
+                PRIMARY KEY (company, key)
+            );
+            CREATE INDEX IF NOT EXISTS articles_undelivered ON articles (company, delivered_at);
+            """)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"[NewsWatchlist] Database error: {e}")
+
+    def add(self, name: str) -> bool:
+        """Adds a company to the watchlist, returns False if it was already on it"""
+        with self._lock:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO watchlist (company, name, added_at) VALUES (?, ?, ?)",
+                (normalize_company(name), name, time.time()),
+            )
+            self.conn.commit()
+            return cursor.rowcount > 0
+
+    def remove(self, name: str) -> bool:
+        """Removes a company and forgets its articles"""
+        company = normalize_company(name)
+        with self._lock:
+            cursor = self.conn.execute("DELETE FROM watchlist WHERE company = ?", (company,))
+            self.conn.execute("DELETE FROM articles WHERE company = ?", (company,))
+            self.conn.commit()
+            return cursor.rowcount > 0
+
+    def companies(self) -> List[Dict]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT w.name, w.last_scan_at, "
+                "(SELECT COUNT(*) FROM articles a WHERE a.company = w.company AND a.delivered_at IS NULL) AS pending "
+                "FROM watchlist w ORDER BY w.name"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def due(self, interval: float = WATCHLIST_SCAN_INTERVAL) -> List[str]:
+        """Names of the companies not scanned for interval seconds"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT name FROM watchlist WHERE last_scan_at IS NULL OR last_scan_at <= ?",
+                (time.time() - interval,),
+            ).fetchall()
+        return [row["name"] for row in rows]
+
+    def scan(self, name: str, scanner) -> List[Dict]:
+        """
+        Searches news for a company and records the articles not seen before.
+
+        Args:
+            name : company name
+            scanner : NewsScannerTool, or anything whose run(name) returns [{title, url, snippet, ...}]
+
+        Returns:
+            the new articles
+
+        Raises:
+            the scanner's error; the company is not stamped as scanned and stays due
+        """
+        company = normalize_company(name)
+        items = scanner.run(name) or []
+        now = time.time()
+        new = []
+        with self._lock:
+            for item in items:
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO articles (company, key, title, url, snippet, first_seen_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (company, article_key(item), item.get("title"), item.get("url"), item.get("snippet"), now),
+                )
+                if cursor.rowcount > 0:
+                    new.append(item)
+            self.conn.execute("UPDATE watchlist SET last_scan_at = ? WHERE company = ?", (now, company))
+            self.conn.commit()
+        print(f"[NewsWatchlist] {name}: {len(new)} new of {len(items)} articles")
+        return new
+
+    def updates(self, scanner, name: Optional[str] = None, rescan_after: float = WATCHLIST_MIN_RESCAN,
+                budget: float = WATCHLIST_UPDATES_BUDGET) -> List[Dict]:
+        """
+        Articles found since the last call, for one company or the whole watchlist.
+        Companies not scanned for rescan_after seconds are scanned first; a
+        company not on the watchlist yet is added, its first scan returns everything.
+
+        Scans stop once budget seconds are spent, the remaining companies stay due
+        for the monitor or the next call. Articles are marked delivered only while
+        the budget lasts: past it the caller has given up on the answer (the tool
+        call timed out), so they stay pending instead of being lost.
+
+        Returns:
+            [{company, title, url, snippet, first_seen_at}, ...], newest first; marked delivered
+
+        Raises:
+            TimeoutError: when the budget ran out before the articles could be handed out
+        """
+        deadline = time.monotonic() + budget
+        if name:
+            self.add(name)
+            names = [name]
+        else:
+            names = [c["name"] for c in self.companies()]
+        companies = [normalize_company(n) for n in names]
+        if not companies:
+            return []
+
+        due = {normalize_company(n) for n in self.due(rescan_after)}
+        for company_name, company in zip(names, companies):
+            if company not in due:
+                continue
+            if time.monotonic() >= deadline:
+                print(f"[NewsWatchlist] Update budget spent, {company_name} is left to the next scan")
+                continue
+            try:
+                self.scan(company_name, scanner)
+            except Exception as e:
+                # The company stays due; what earlier scans found is still handed out
+                print(f"[NewsWatchlist] Scan of {company_name} failed: {e}")
+
+        marks = ",".join("?" * len(companies))
+        with self._lock:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"news_updates took longer than {budget:g} seconds, articles stay pending")
+            rows = self.conn.execute(
+                f"SELECT company, title, url, snippet, first_seen_at FROM articles "
+                f"WHERE delivered_at IS NULL AND company IN ({marks}) ORDER BY first_seen_at DESC",
+                companies,
+            ).fetchall()
+            self.conn.execute(
+                f"UPDATE articles SET delivered_at = ? WHERE delivered_at IS NULL AND company IN ({marks})",
+                [time.time(), *companies],
+            )
+            self.conn.commit()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        self.conn.close()
+
+
+class WatchlistMonitor:
+    """Background thread rescanning every watchlist company once per interval"""
+
+    def __init__(self, watchlist: NewsWatchlist, scanner, interval: float = WATCHLIST_SCAN_INTERVAL,
+                 poll: float = WATCHLIST_POLL):
+        """
+        Args:
+            watchlist : NewsWatchlist to keep up to date
+            scanner : NewsScannerTool used for the scans
+            interval : seconds between two scans of the same company
+            poll : seconds between two checks for companies that are due
+        """
+        self.watchlist = watchlist
+        self.scanner = scanner
+        self.interval = interval
+        self.poll = poll
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="watchlist-monitor", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.poll):
+            for name in self.watchlist.due(self.interval):
+                if self._stop.is_set():
+                    return
+                try:
+                    self.watchlist.scan(name, self.scanner)
+                except Exception as e:
+                    # Rate limited or upstream down: the company stays due and is retried next poll
+                    print(f"[WatchlistMonitor] Scan of {name} failed: {e}")
@@ -10,17 +10,100 @@ import io
 import re
 import pandas as pd
 from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 import tempfile
 import os
+import hashlib
+import shutil
 import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from werkzeug.datastructures import FileStorage
+from server.cache import BlobCache
+from shared.config import PDF_WORKERS, PDF_PARALLEL_MIN_PAGES, PDF_TASKS_PER_WORKER
+from shared.config import PDF_MIN_PAGE_CHARS, PDF_TABLE_MIN_RULES, PDF_TABLE_NUMERIC_SHARE
+from shared.config import PDF_CACHE_DB, PDF_CACHE_MAX_BYTES, PDF_SPILL_BYTES
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Page extraction pool shared by all analyses, started on first use
+_pool = None
+_pool_lock = threading.Lock()
+
+# Part of every cache key: bump it when extraction or analysis output changes so older entries are not served
+CACHE_VERSION = 1
+# Analysis types of analyze_pdf_report, each cached under its own key
+ANALYSIS_TYPES = ("comprehensive", "financial", "summary")
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def pdf_cache() -> BlobCache:
+    """Analyses and extractions of already seen files, shared by all analyses"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = BlobCache(PDF_CACHE_DB, PDF_CACHE_MAX_BYTES)
+        return _cache
+
+
+def file_digest(file_input: FileStorage) -> str:
+    """SHA-256 of the uploaded bytes, the stream is rewound afterwards"""
+    digest = hashlib.sha256()
+    file_input.stream.seek(0)
+    for chunk in iter(lambda: file_input.stream.read(1024 * 1024), b""):
+        digest.update(chunk)
+    file_input.stream.seek(0)
+    return digest.hexdigest()
+
+
+def _page_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Never fork the server itself: its dispatcher, hedge and event loop threads may hold locks
+            # (logging, stdio) a forked child would inherit taken. forkserver forks the workers from a
+            # single-threaded helper that imports the main module once; spawn where there is no forkserver.
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=context)
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """Drops a broken pool so the next analysis starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def page_ranges(total_pages: int, parts: int) -> List[Tuple[int, int]]:
+    """Splits pages [0, total_pages) into at most parts contiguous (start, stop) ranges of near-equal size"""
+    parts = max(1, min(parts, total_pages))
+    size, extra = divmod(total_pages, parts)
+    ranges, start = [], 0
+    for part in range(parts):
+        stop = start + size + (1 if part < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+# "1,234", "(56.7)", "$9", "12%": tokens of financial tables
+_NUMERIC_TOKEN = re.compile(r"^[(\-$]*\d[\d,.]*%?\)?$")
+
+
+def _extract_page_range(source: "PDFSource", start: int, stop: int) -> List["PageExtraction"]:
+    """Pool task: extraction of pages [start, stop)"""
+    return PDFReader(workers=1)._extract_page_range(source, start, stop)
+
 @dataclass
 class PDFAnalysisResult:
     """Structure for PDF analysis results"""
@@ -33,13 +116,87 @@ class PDFAnalysisResult:
     sections: Dict[str, str]
     summary: str
     analysis_type: str
+    page_engines: List[str] = field(default_factory=list)
+
+class PDFSource:
+    """
+    The bytes of a PDF, held in memory, or in a uniquely named file when the
+    upload is larger than PDF_SPILL_BYTES. Opens the document for each engine
+    without going through a temp file otherwise.
+    """
+
+    def __init__(self, data: Optional[bytes] = None, path: Optional[str] = None, owns_file: bool = False):
+        self.data = data
+        self.path = path
+        self.owns_file = owns_file
+
+    @classmethod
+    def from_upload(cls, file_input: FileStorage, spill_bytes: int = PDF_SPILL_BYTES) -> "PDFSource":
+        stream = file_input.stream
+        stream.seek(0, 2)
+        size = stream.tell()
+        stream.seek(0)
+        try:
+            if size <= spill_bytes:
+                return cls(data=stream.read())
+            # mkstemp: concurrent uploads of files with the same name must not share a path
+            fd, path = tempfile.mkstemp(prefix="pdf_analysis_", suffix=".pdf")
+            with os.fdopen(fd, "wb") as file:
+                shutil.copyfileobj(stream, file)
+            return cls(path=path, owns_file=True)
+        finally:
+            stream.seek(0)
+
+    def open_fitz(self):
+        if self.data is not None:
+            return fitz.open(stream=self.data, filetype="pdf")
+        return fitz.open(self.path)
+
+    def open_plumber(self, pages=None):
+        return pdfplumber.open(io.BytesIO(self.data) if self.data is not None else self.path, pages=pages)
+
+    def open_binary(self):
+        return io.BytesIO(self.data) if self.data is not None else open(self.path, 'rb')
+
+    def __getstate__(self):
+        # Pool workers only read the source, the file stays owned by the analysis that spilled it
+        return {"data": self.data, "path": self.path, "owns_file": False}
+
+    def close(self):
+        """Removes the spill file, if any"""
+        if self.owns_file and self.path:
+            try:
+                os.remove(self.path)
+            except OSError as e:
+                logger.warning(f"Could not clean up spill file: {e}")
+            self.owns_file = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+@dataclass
+class PageExtraction:
+    """Text and tables of one page, and the engine that read them"""
+    text: str
+    tables: List[Dict[str, Any]]
+    engine: str  # "pymupdf" or "pdfplumber"
 
 class PDFReader:
     """
     Advanced PDF reader and analyzer for financial reports
     """
     
-    def __init__(self):
+    def __init__(self, workers: int = PDF_WORKERS, cache: Optional[BlobCache] = None):
+        """
+        Args:
+            workers: processes extracting the pages of large documents, 1 extracts in-process
+            cache: BlobCache keeping the extraction of each file by content hash, None to always extract
+        """
+        self.workers = workers
+        self.cache = cache
         self.financial_keywords = [
             'revenue', 'profit', 'loss', 'ebitda', 'operating income',
             'net income', 'gross margin', 'cash flow', 'assets', 'liabilities',
@@ -62,21 +219,18 @@ class PDFReader:
             'management_discussion': r'management\s+discussion|md&a'
         }
 
-    def analyze_pdf(self, file_input: FileStorage, analysis_type: str = "comprehensive") -> PDFAnalysisResult:
+    def analyze_pdf(self, file_input: FileStorage, analysis_type: str = "comprehensive",
+                    digest: Optional[str] = None) -> PDFAnalysisResult:
         """
         Main method to analyze a PDF file
         
         Args:
             file_input: Flask FileStorage object or file path
             analysis_type: Type of analysis ('comprehensive', 'financial', 'summary')
+            digest: file_digest of the upload, if the caller already computed it
         """
         try:
-            # Save uploaded file temporarily
-            temp_path = self._save_temp_file(file_input)
-            
-            # Extract text and metadata
-            text_content = self._extract_text_multiple_methods(temp_path)
-            tables = self._extract_tables(temp_path)
+            text_content, tables, total_pages, page_engines = self._cached_extraction(file_input, digest)
             
             # Analyze content
             financial_data = self._extract_financial_data(text_content)
@@ -86,12 +240,6 @@ class PDFReader:
             # Generate summary based on analysis type
             summary = self._generate_summary(text_content, financial_data, analysis_type)
             
-            # Get total pages
-            total_pages = self._get_page_count(temp_path)
-            
-            # Clean up temp file
-            self._cleanup_temp_file(temp_path)
-            
             return PDFAnalysisResult(
                 filename=file_input.filename,
                 total_pages=total_pages,
@@ -101,57 +249,193 @@ class PDFReader:
                 tables=tables,
                 sections=sections,
                 summary=summary,
-                analysis_type=analysis_type
+                analysis_type=analysis_type,
+                page_engines=page_engines
             )
             
         except Exception as e:
             logger.error(f"Error analyzing PDF: {str(e)}")
             raise Exception(f"PDF analysis failed: {str(e)}")
 
-    def _save_temp_file(self, file_input: FileStorage) -> str:
-        """Save uploaded file to temporary location"""
-        temp_dir = tempfile.gettempdir()
-        temp_path = os.path.join(temp_dir, f"pdf_analysis_{file_input.filename}")
-        file_input.save(temp_path)
-        return temp_path
+    def _cached_extraction(self, file_input: FileStorage, digest: Optional[str] = None):
+        """
+        Text, tables, page count and page engines of the upload, from the cache
+        when the same bytes were extracted before. Every analysis type starts
+        from the same extraction, so switching types does not re-parse the PDF.
+        """
+        key = None
+        if self.cache is not None:
+            key = f"extraction:v{CACHE_VERSION}:{digest or file_digest(file_input)}"
+            hit, extraction = self.cache.get(key)
+            if hit:
+                logger.info(f"Reusing the extraction of {file_input.filename}")
+                return tuple(extraction)
+
+        # Read the upload in memory, spilling only large files to disk
+        with PDFSource.from_upload(file_input) as source:
+            # Extract text, tables and page count in a single pass over the document
+            extraction = self._extract_document(source)
+        if key is not None and (extraction[0].strip() or extraction[2]):
+            self.cache.set(key, list(extraction))
+        return extraction
+
+    def _extract_document(self, source: PDFSource) -> Tuple[str, List[Dict[str, Any]], int, List[str]]:
+        """
+        Walk the pages of the PDF a single time, collecting text, tables, page
+        count and the engine used for each page together.
+        """
+        pages = []
+        if self.workers > 1:
+            total_pages = self._get_page_count(source)
+            if total_pages >= PDF_PARALLEL_MIN_PAGES:
+                pages = self._extract_pages_parallel(source, total_pages)
+        if not pages:
+            try:
+                pages = self._extract_page_range(source)
+            except Exception as e:
+                logger.warning(f"page extraction failed: {e}")
+            total_pages = len(pages) or self._get_page_count(source)
+
+        text_content = "".join(page.text + "\n" for page in pages if page.text)
+        tables = [table for page in pages for table in page.tables]
+        if not text_content.strip():
+            text_content = self._extract_text_fallback(source)
+        return text_content, tables, total_pages, [page.engine for page in pages]
 
-    def _cleanup_temp_file(self, temp_path: str):
-        """Clean up temporary file"""
+    def _extract_page_range(self, source: PDFSource, start: int = 0, stop: Optional[int] = None) -> List[PageExtraction]:
+        """
+        Tiered extraction of the pages in [start, stop), all pages by default:
+        PyMuPDF reads every page, pdfplumber's layout analysis is run only on
+        pages the fast text looks wrong for (see _needs_layout). Each engine
+        opens the document at most once.
+        """
         try:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+            doc = source.open_fitz()
         except Exception as e:
-            logger.warning(f"Could not clean up temp file: {e}")
+            logger.warning(f"PyMuPDF could not open the file, using pdfplumber for every page: {e}")
+            return self._extract_layout_range(source, start, stop)
+
+        pages = []
+        plumber = None
+        try:
+            for page_num in range(start, doc.page_count if stop is None else stop):
+                fast_page = doc[page_num]
+                text = fast_page.get_text()
+                if not self._needs_layout(fast_page, text):
+                    pages.append(PageExtraction(text, [], "pymupdf"))
+                    continue
+                if plumber is None:
+                    plumber = source.open_plumber()
+                page = plumber.pages[page_num]
+                layout_text, tables = self._extract_page(page, page_num)
+                page.close()
+                pages.append(PageExtraction(layout_text or text, tables, "pdfplumber"))
+        finally:
+            doc.close()
+            if plumber is not None:
+                plumber.close()
+        return pages
+
+    def _extract_layout_range(self, source: PDFSource, start: int = 0, stop: Optional[int] = None) -> List[PageExtraction]:
+        """pdfplumber extraction of every page in [start, stop), from a single open of the document"""
+        pages = []
+        selection = None if stop is None else range(start + 1, stop + 1)
+        with source.open_plumber(pages=selection) as pdf:
+            for page in pdf.pages:
+                page_text, page_tables = self._extract_page(page, page.page_number - 1)
+                pages.append(PageExtraction(page_text, page_tables, "pdfplumber"))
+                page.close()
+        return pages
+
+    def _needs_layout(self, page, text: str) -> bool:
+        """
+        Whether a page needs pdfplumber: PyMuPDF found little or garbled text,
+        or the page looks like a table (number-dense text or ruled lines)
+        """
+        stripped = text.strip()
+        if len(stripped) < PDF_MIN_PAGE_CHARS or stripped.count("\ufffd") > len(stripped) * 0.05:
+            return True
+        tokens = stripped.split()
+        numeric = sum(1 for token in tokens if _NUMERIC_TOKEN.match(token))
+        if len(tokens) >= 20 and numeric / len(tokens) >= PDF_TABLE_NUMERIC_SHARE:
+            return True
+        rules = 0
+        for drawing in page.get_drawings():
+            rules += sum(1 for item in drawing["items"] if item[0] in ("l", "re"))
+            if rules >= PDF_TABLE_MIN_RULES:
+                return True
+        return False
+
+    def _extract_pages_parallel(self, source: PDFSource, total_pages: int) -> List[PageExtraction]:
+        """
+        Splits the pages into ranges extracted by the process pool and reassembles
+        them in page order. Returns an empty list when the pool failed, so the
+        caller extracts in-process instead.
+        """
+        # Each task of an in-memory source pickles the whole document, so split it less finely
+        tasks = self.workers if source.data is not None else self.workers * PDF_TASKS_PER_WORKER
+        ranges = page_ranges(total_pages, tasks)
+        logger.info(f"Extracting {total_pages} pages in {len(ranges)} ranges on {self.workers} processes")
+        pool = None
+        try:
+            pool = _page_pool()
+            futures = [pool.submit(_extract_page_range, source, start, stop) for start, stop in ranges]
+            return [page for future in futures for page in future.result()]
+        except Exception as e:
+            logger.warning(f"Parallel extraction failed, extracting in-process: {e}")
+            if isinstance(e, BrokenProcessPool) and pool is not None:
+                _discard_pool(pool)
+            return []
+
+    def _extract_page(self, page, page_num: int) -> Tuple[str, List[Dict[str, Any]]]:
+        """Text and tables of one pdfplumber page"""
+        page_text = ""
+        try:
+            page_text = page.extract_text() or ""
+        except Exception as e:
+            logger.warning(f"Text extraction failed on page {page_num + 1}: {e}")
+        try:
+            page_tables = self._table_dicts(page_num, page.extract_tables())
+        except Exception as e:
+            logger.warning(f"Table extraction failed on page {page_num + 1}: {e}")
+            page_tables = []
+        return page_text, page_tables
+
+    def _table_dicts(self, page_num: int, page_tables: List[List[List[Any]]]) -> List[Dict[str, Any]]:
+        """Table dicts of the tables found on one page"""
+        tables = []
+        for table_num, table in enumerate(page_tables):
+            if table and len(table) > 1:  # Skip empty or single-row tables
+                tables.append({
+                    'page': page_num + 1,
+                    'table_number': table_num + 1,
+                    'headers': table[0] if table else [],
+                    'data': table[1:] if len(table) > 1 else [],
+                    'row_count': len(table) - 1,
+                    'column_count': len(table[0]) if table else 0
+                })
+        return tables
 
-    def _extract_text_multiple_methods(self, file_path: str) -> str:
-        """Extract text using multiple methods for better accuracy"""
+    def _extract_text_fallback(self, source: PDFSource) -> str:
+        """
+        Text of a document the page-by-page extraction (PyMuPDF, pdfplumber on
+        the pages that need it) returned nothing for: a whole-document PyMuPDF
+        read, then PyPDF2.
+        """
         text_content = ""
-        
-        # Method 1: pdfplumber (best for structured text)
         try:
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_content += page_text + "\n"
+            doc = source.open_fitz()
+            for page_num in range(doc.page_count):
+                page = doc[page_num]
+                text_content += page.get_text() + "\n"
+            doc.close()
         except Exception as e:
-            logger.warning(f"pdfplumber extraction failed: {e}")
-        
-        # Method 2: PyMuPDF (fallback)
-        if not text_content.strip():
-            try:
-                doc = fitz.open(file_path)
-                for page_num in range(doc.page_count):
-                    page = doc[page_num]
-                    text_content += page.get_text() + "\n"
-                doc.close()
-            except Exception as e:
-                logger.warning(f"PyMuPDF extraction failed: {e}")
+            logger.warning(f"PyMuPDF extraction failed: {e}")
         
-        # Method 3: PyPDF2 (last resort)
+        # PyPDF2 as the last resort
         if not text_content.strip():
             try:
-                with open(file_path, 'rb') as file:
+                with source.open_binary() as file:
                     pdf_reader = PyPDF2.PdfReader(file)
                     for page in pdf_reader.pages:
                         text_content += page.extract_text() + "\n"
@@ -160,30 +444,6 @@ class PDFReader:
         
         return text_content
 
-    def _extract_tables(self, file_path: str) -> List[Dict[str, Any]]:
-        """Extract tables from PDF"""
-        tables = []
-        
-        try:
-            with pdfplumber.open(file_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    page_tables = page.extract_tables()
-                    for table_num, table in enumerate(page_tables):
-                        if table and len(table) > 1:  # Skip empty or single-row tables
-                            table_dict = {
-                                'page': page_num + 1,
-                                'table_number': table_num + 1,
-                                'headers': table[0] if table else [],
-                                'data': table[1:] if len(table) > 1 else [],
-                                'row_count': len(table) - 1,
-                                'column_count': len(table[0]) if table else 0
-                            }
-                            tables.append(table_dict)
-        except Exception as e:
-            logger.warning(f"Table extraction failed: {e}")
-        
-        return tables
-
     def _extract_financial_data(self, text: str) -> Dict[str, Any]:
         """Extract financial data using pattern matching"""
         financial_data = {}
@@ -333,17 +593,17 @@ class PDFReader:
         
         return "\n".join(summary_parts)
 
-    def _get_page_count(self, file_path: str) -> int:
-        """Get total page count"""
+    def _get_page_count(self, source: PDFSource) -> int:
+        """Get total page count, from PyMuPDF's page tree without parsing any page"""
         try:
-            with pdfplumber.open(file_path) as pdf:
-                return len(pdf.pages)
+            doc = source.open_fitz()
+            count = doc.page_count
+            doc.close()
+            return count
         except:
             try:
-                doc = fitz.open(file_path)
-                count = doc.page_count
-                doc.close()
-                return count
+                with source.open_plumber() as pdf:
+                    return len(pdf.pages)
             except:
                 return 0
 
@@ -375,9 +635,12 @@ class PDFReader:
 # Utility function for integration with the main server
 def analyze_pdf_report(file_input: FileStorage, analysis_type: str = "comprehensive") -> Dict[str, Any]:
     """
-    Main function to be called from the server interface
+    Main function to be called from the server interface. Successful analyses
+    that read some text or pages are cached by the hash of the file bytes and
+    the analysis type, one of ANALYSIS_TYPES.
     """
-    reader = PDFReader()
+    cache = pdf_cache()
+    reader = PDFReader(cache=cache)
     
     # Validate file
     is_valid, message = reader.validate_file(file_input)
@@ -388,9 +651,24 @@ def analyze_pdf_report(file_input: FileStorage, analysis_type: str = "comprehens
             'analysis': None
         }
     
-    try:
-        result = reader.analyze_pdf(file_input, analysis_type)
+    if analysis_type not in ANALYSIS_TYPES:
         return {
+            'success': False,
+            'error': f"Unsupported analysis type '{analysis_type}', expected one of: {', '.join(ANALYSIS_TYPES)}",
+            'analysis': None
+        }
+
+    digest = file_digest(file_input)
+    key = f"analysis:v{CACHE_VERSION}:{digest}:{analysis_type}"
+    hit, response = cache.get(key)
+    if hit:
+        logger.info(f"Reusing the {analysis_type} analysis of {file_input.filename}")
+        response['analysis']['filename'] = file_input.filename
+        return response
+
+    try:
+        result = reader.analyze_pdf(file_input, analysis_type, digest)
+        response = {
             'success': True,
             'error': None,
             'analysis': {
@@ -402,6 +680,7 @@ def analyze_pdf_report(file_input: FileStorage, analysis_type: str = "comprehens
                 'sections_identified': list(result.sections.keys()),
                 'summary': result.summary,
                 'analysis_type': result.analysis_type,
+                'page_engines': result.page_engines,
                 'preview_text': result.extracted_text[:500] + "..." if len(result.extracted_text) > 500 else result.extracted_text
             }
         }
@@ -411,6 +690,10 @@ def analyze_pdf_report(file_input: FileStorage, analysis_type: str = "comprehens
             'error': str(e),
             'analysis': None
         }
+    # Like the extraction: an empty read may be a transient failure, try it again next time
+    if result.extracted_text.strip() or result.total_pages:
+        cache.set(key, response)
+    return response
 
 if __name__ == "__main__":
     # Test the PDF reader
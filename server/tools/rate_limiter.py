@@ -0,0 +1,135 @@
+# server/tools/rate_limiter.py
+
+"""
+Central rate scheduler for the metered upstream APIs.
+
+Every upstream gets a token bucket (sustained rate + burst) and optionally a
+daily quota, both configured in shared.config.RATE_LIMITS. A tool calls
+`rate_limits.acquire("<upstream>")` before each request: when the bucket is
+empty the caller is queued until its token is due, so bursts are spread out
+instead of turning into 429s. A caller that would have to wait longer than its
+bound, or whose daily quota is spent, fails fast with RateLimitExceeded.
+"""
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from server.metrics import metrics
+from shared.config import RATE_LIMITS, RATE_LIMIT_MAX_WAIT
+
+
+class RateLimitExceeded(RuntimeError):
+    """Raised instead of calling an upstream whose budget is exhausted"""
+
+    def __init__(self, upstream: str, retry_after: float, reason: str):
+        super().__init__(f"Rate limit of {upstream} reached ({reason}), retry in {retry_after:.0f} seconds")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+@dataclass
+class Limit:
+    """Budget of one upstream"""
+    rate: float                   # tokens added per second
+    burst: int = 1                # bucket capacity, calls allowed back to back
+    daily: Optional[int] = None   # calls per UTC day, None for no daily quota
+
+
+def _seconds_to_midnight(now: float) -> float:
+    return 86400 - now % 86400
+
+
+class TokenBucket:
+    def __init__(self, name: str, limit: Limit):
+        self.name = name
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._tokens = float(limit.burst)
+        self._updated = time.monotonic()
+        self._day = None
+        self._used_today = 0
+
+    def reserve(self, max_wait: float) -> float:
+        """
+        Takes a token and returns how long the caller has to wait before using it.
+        Raises RateLimitExceeded, without taking anything, when the wait would
+        exceed max_wait or the daily quota is spent.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.limit.burst, self._tokens + (now - self._updated) * self.limit.rate)
+            self._updated = now
+
+            if self.limit.daily is not None:
+                wall = time.time()
+                day = int(wall // 86400)
+                if day != self._day:
+                    self._day, self._used_today = day, 0
+                if self._used_today >= self.limit.daily:
+                    raise RateLimitExceeded(self.name, _seconds_to_midnight(wall), f"daily quota of {self.limit.daily}")
+
+            # Tokens may go negative: callers already queued own the refill ahead of this one
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.limit.rate
+            if wait > max_wait:
+                raise RateLimitExceeded(self.name, wait, f"{self.limit.rate:g}/s")
+            self._tokens -= 1
+            if self.limit.daily is not None:
+                self._used_today += 1
+            return wait
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"tokens": round(self._tokens, 2), "used_today": self._used_today}
+
+
+class RateScheduler:
+    def __init__(self, limits: Dict[str, dict] = None, max_wait: float = RATE_LIMIT_MAX_WAIT):
+        """
+        Args:
+            limits : upstream -> {"rate", "burst", "daily"}
+            max_wait : default bound on the time a caller is queued
+        """
+        self.max_wait = max_wait
+        self.enabled = True
+        self._buckets: Dict[str, TokenBucket] = {}
+        for upstream, limit in (limits or {}).items():
+            self.configure(upstream, **limit)
+
+    def configure(self, upstream: str, rate: float, burst: int = 1, daily: Optional[int] = None):
+        """(Re)defines the budget of an upstream, resetting its bucket"""
+        self._buckets[upstream] = TokenBucket(upstream, Limit(rate, burst, daily))
+
+    def _reserve(self, upstream, max_wait):
+        bucket = self._buckets.get(upstream)
+        if not self.enabled or bucket is None:
+            return 0.0
+        try:
+            wait = bucket.reserve(self.max_wait if max_wait is None else max_wait)
+        except RateLimitExceeded:
+            metrics.inc_throttled(upstream)
+            raise
+        if wait > 0:
+            metrics.observe_rate_wait(upstream, wait)
+        return wait
+
+    def acquire(self, upstream: str, max_wait: Optional[float] = None):
+        """Blocks until a call to upstream is allowed, or raises RateLimitExceeded"""
+        wait = self._reserve(upstream, max_wait)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, upstream: str, max_wait: Optional[float] = None):
+        """Event-loop version of acquire"""
+        wait = self._reserve(upstream, max_wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def stats(self) -> dict:
+        return {name: bucket.stats() for name, bucket in self._buckets.items()}
+
+
+# Shared by every tool instance, so all concurrent batches draw from the same budgets
+rate_limits = RateScheduler(RATE_LIMITS)
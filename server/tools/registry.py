@@ -0,0 +1,238 @@
+# server/tools/registry.py
+
+"""
+Registry of the tools exposed through the /requests protocol.
+
+A tool declares its name, params, description and execution traits with the
+`tool` decorator. `ToolRegistry` collects the declarations into a dict so that
+a method such as "tools/websearch" is dispatched with a single lookup, and the
+tool description handed to the LLM is generated from the same declarations.
+"""
+
+import asyncio
+import functools
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from shared.utils import call_key
+
+# Execution kinds, the dispatcher runs each on its own pool
+IO = "io"     # waits on an upstream API, safe to overlap freely
+CPU = "cpu"   # burns CPU in-process, e.g. model inference or PDF parsing; bounded by CPU_WORKERS
+
+
+@dataclass(frozen=True)
+class Param:
+    """A single parameter of a tool"""
+    name: str
+    type: str = "string"
+    description: str = ""
+    required: bool = True
+    default: Any = None
+    normalize: Optional[Callable[[str], str]] = None   # canonical form used in cache/coalescing keys
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """Declaration of a tool: what the LLM is told about it and how it should be executed"""
+    name: str
+    description: str = ""
+    params: Tuple[Param, ...] = ()
+    kind: str = IO
+    cacheable: bool = False
+    ttl: int = 0                            # seconds a cached result stays fresh
+    timeout: Optional[float] = None         # None means the server wide TOOL_TIMEOUT
+    max_concurrency: Optional[int] = None   # None means unbounded
+    listed: bool = True                     # include in the generated tool description
+    expand_results: bool = False            # handler already returns the results list
+
+
+class MissingParamError(ValueError):
+    """Raised when a request does not carry a required param"""
+
+
+class Uncacheable:
+    """
+    Wraps the answer of a cacheable tool that must reach the client but not the
+    result cache, e.g. a partial answer where some upstream calls failed.
+    """
+
+    def __init__(self, answer: Any):
+        self.answer = answer
+
+
+class UncachedResults(list):
+    """Results list of a call whose handler answered Uncacheable"""
+
+
+def async_variant(sync_fn):
+    """
+    Decorator marking a coroutine method as the event-loop implementation of a
+    @tool method. The async serving mode awaits it instead of running the
+    blocking method on a worker thread.
+    """
+    def decorator(afn):
+        afn.async_variant_of = sync_fn.tool_spec.name
+        return afn
+    return decorator
+
+
+def tool(name: str, description: str = "", params=(), **traits):
+    """
+    Decorator declaring a method as a tool.
+
+    Args:
+        name : name used in the protocol, e.g. "websearch" for "tools/websearch"
+        description : text shown to the LLM
+        params : list of Param
+        traits : any other ToolSpec field (kind, cacheable, ttl, timeout, ...)
+    """
+    def decorator(fn):
+        fn.tool_spec = ToolSpec(name=name, description=description, params=tuple(params), **traits)
+        return fn
+    return decorator
+
+
+class RegisteredTool:
+    """A ToolSpec bound to the callable that executes it"""
+
+    def __init__(self, spec: ToolSpec, handler: Callable, ahandler: Optional[Callable] = None):
+        self.spec = spec
+        self.handler = handler
+        self.ahandler = ahandler
+        self._slots = threading.BoundedSemaphore(spec.max_concurrency) if spec.max_concurrency else None
+        self._aslots = None
+
+    def bind(self, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Maps request params onto handler kwargs, filling defaults and checking required params"""
+        params = params or {}
+        kwargs = {}
+        for p in self.spec.params:
+            if params.get(p.name) is not None:
+                kwargs[p.name] = params[p.name]
+            elif p.required:
+                raise MissingParamError(f"Missing required param '{p.name}' for {self.spec.name}")
+            else:
+                kwargs[p.name] = p.default
+        return kwargs
+
+    def key(self, params: Optional[Dict[str, Any]]) -> str:
+        """Cache/coalescing key of a call, trivial variants of the params map to the same key"""
+        normalizers = {p.name: p.normalize for p in self.spec.params if p.normalize}
+        return call_key(self.spec.name, self.bind(params), normalizers)
+
+    def call(self, params: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """Executes the tool and returns the results list of the response entry"""
+        kwargs = self.bind(params)
+        if self._slots:
+            with self._slots:
+                ans = self.handler(**kwargs)
+        else:
+            ans = self.handler(**kwargs)
+        return self._results(ans)
+
+    async def acall(self, params: Optional[Dict[str, Any]] = None, executor=None) -> List[Any]:
+        """
+        Event-loop version of call. Uses the async variant when the tool has one,
+        otherwise runs the blocking handler on the given executor so it never
+        blocks the loop.
+        """
+        if self.ahandler is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, functools.partial(self.call, params))
+        kwargs = self.bind(params)
+        if self.spec.max_concurrency and self._aslots is None:
+            self._aslots = asyncio.Semaphore(self.spec.max_concurrency)
+        if self._aslots:
+            async with self._aslots:
+                ans = await self.ahandler(**kwargs)
+        else:
+            ans = await self.ahandler(**kwargs)
+        return self._results(ans)
+
+    def _results(self, ans) -> List[Any]:
+        """Results list of a handler answer, UncachedResults when the answer is Uncacheable"""
+        if isinstance(ans, Uncacheable):
+            return UncachedResults(self._results(ans.answer))
+        return ans if self.spec.expand_results else [ans]
+
+
+class ToolRegistry:
+    """Name -> RegisteredTool mapping for one namespace of the protocol"""
+
+    def __init__(self):
+        self._tools: Dict[str, RegisteredTool] = {}
+
+    def register(self, spec: ToolSpec, handler: Callable, ahandler: Optional[Callable] = None) -> RegisteredTool:
+        if spec.name in self._tools:
+            raise ValueError(f"Tool '{spec.name}' is already registered")
+        entry = RegisteredTool(spec, handler, ahandler)
+        self._tools[spec.name] = entry
+        return entry
+
+    def get(self, name: str) -> Optional[RegisteredTool]:
+        return self._tools.get(name)
+
+    def names(self) -> List[str]:
+        return list(self._tools)
+
+    def specs(self) -> List[ToolSpec]:
+        return [entry.spec for entry in self._tools.values()]
+
+    def describe(self) -> str:
+        return describe_tools(self.specs())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def __iter__(self) -> Iterator[RegisteredTool]:
+        return iter(self._tools.values())
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    @staticmethod
+    def declared(cls) -> List[ToolSpec]:
+        """Specs declared with @tool on a class, in definition order"""
+        specs = []
+        for klass in reversed(cls.__mro__):
+            for attr in vars(klass).values():
+                spec = getattr(attr, "tool_spec", None)
+                if isinstance(spec, ToolSpec):
+                    specs.append(spec)
+        return specs
+
+    @classmethod
+    def from_object(cls, obj) -> "ToolRegistry":
+        """Builds a registry from the @tool and @async_variant methods of an instance"""
+        registry = cls()
+        variants = {}
+        for klass in reversed(type(obj).__mro__):
+            for attr_name, attr in vars(klass).items():
+                spec = getattr(attr, "tool_spec", None)
+                if isinstance(spec, ToolSpec):
+                    registry.register(spec, getattr(obj, attr_name))
+                elif hasattr(attr, "async_variant_of"):
+                    variants[attr.async_variant_of] = getattr(obj, attr_name)
+        for name, ahandler in variants.items():
+            registry._tools[name].ahandler = ahandler
+        return registry
+
+
+def describe_tools(specs: List[ToolSpec]) -> str:
+    """Renders the tool description given to the LLM planner"""
+    lines = [""]
+    listed = [spec for spec in specs if spec.listed]
+    for i, spec in enumerate(listed, start=1):
+        lines.append(f"Tool {i}:")
+        lines.append(f"    name : \"{spec.name}\"")
+        if spec.params:
+            lines.append("    params :")
+            for j, p in enumerate(spec.params, start=1):
+                note = ", ".join(filter(None, [p.description, "" if p.required else "optional"]))
+                lines.append(f"        {j}. {p.name}:{p.type} ({note})")
+        else:
+            lines.append("    params : none")
+        lines.append(f"    description : {spec.description}")
+    return "\n".join(lines) + "\n"
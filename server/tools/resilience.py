@@ -0,0 +1,404 @@
+# server/tools/resilience.py
+
+"""
+Retries and circuit breaking for calls to upstream APIs.
+
+`RetryPolicy` retries only errors worth retrying (timeouts, connection errors,
+429 and 5xx answers) with exponential backoff and full jitter. A
+`CircuitBreaker` per upstream counts consecutive failures; once open, calls fail
+immediately with CircuitOpenError until a cool-down has passed, so a tool can
+fail over to another provider instead of waiting on one that is down. Quota
+errors open the circuit right away for a longer cool-down. `hedge` races a
+secondary provider against a primary that is slower than usual, as measured
+by a `LatencyTracker`; `RetryPolicy.acall` and `ahedge` are the event-loop
+versions. A tool call can be given a cancel event with `cancel_scope`; every
+RetryPolicy on that thread stops retrying once it is set.
+
+    policy = RetryPolicy("google_cse", breaker=circuit_breaker("google_cse"))
+    results = policy.call(search, query)
+"""
+
+import asyncio
+import contextlib
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Optional
+
+from server.metrics import metrics
+from server.tools.rate_limiter import RateLimitExceeded
+from shared.http import TRANSIENT_ERRORS
+from shared.config import (
+    RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY,
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT, CIRCUIT_QUOTA_RESET_TIMEOUT,
+)
+
+# Circuit states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+# Cancel event of the tool call running on the current thread, see cancel_scope
+_scope = threading.local()
+
+
+@contextlib.contextmanager
+def cancel_scope(cancel: threading.Event):
+    """
+    Runs a block with a cancel event the RetryPolicy calls made in it watch, so a
+    call the dispatcher gave up on (timed out) stops retrying and frees its thread.
+    """
+    previous = getattr(_scope, "cancel", None)
+    _scope.cancel = cancel
+    try:
+        yield cancel
+    finally:
+        _scope.cancel = previous
+
+
+def current_cancel() -> Optional[threading.Event]:
+    """Cancel event of the enclosing cancel_scope, if any"""
+    return getattr(_scope, "cancel", None)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"Circuit of {upstream} is open, retry in {retry_after:.0f} seconds")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+def status_of(error: Exception) -> Optional[int]:
+    """HTTP status carried by a requests, httpx or googleapiclient error, if any"""
+    response = getattr(error, "response", None)
+    if response is not None and getattr(response, "status_code", None):
+        return response.status_code
+    resp = getattr(error, "resp", None)   # googleapiclient.errors.HttpError
+    status = getattr(resp, "status", None) or getattr(error, "status_code", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Daily quota or billing exhausted: retrying is pointless until the quota resets"""
+    text = str(error).lower()
+    status = status_of(error)
+    if status == 403:
+        return any(marker in text for marker in ("quota", "dailylimit", "billing", "limit exceeded"))
+    if status == 429:
+        # Google CSE answers an exhausted daily quota with 429 too, plain throttling stays retryable
+        return any(marker in text for marker in ("quota exceeded", "per day", "dailylimit"))
+    return False
+
+
+def is_retryable(error: Exception) -> bool:
+    """Transient failures: timeouts, dropped connections, throttling and server errors"""
+    if isinstance(error, (RateLimitExceeded, CircuitOpenError)) or is_quota_error(error):
+        return False
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    status = status_of(error)
+    if status is not None:
+        return status in (408, 429) or status >= 500
+    text = str(error).lower()
+    return "rate limit" in text or "ratelimitexceeded" in text or "temporarily" in text
+
+
+def is_failure(error: Exception) -> bool:
+    """Errors that say something about the upstream's health, local refusals do not"""
+    return not isinstance(error, (RateLimitExceeded, CircuitOpenError))
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+                 quota_reset_timeout: float = CIRCUIT_QUOTA_RESET_TIMEOUT):
+        """
+        Args:
+            name : upstream the breaker protects, used in errors and metrics
+            failure_threshold : consecutive failures that open the circuit
+            reset_timeout : seconds the circuit stays open before one trial call is let through
+            quota_reset_timeout : seconds the circuit stays open after a quota error
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.quota_reset_timeout = quota_reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._open_until = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() >= self._open_until:
+                return HALF_OPEN
+            return self._state
+
+    def before_call(self):
+        """Raises CircuitOpenError unless a call may go through now"""
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            now = time.monotonic()
+            if now < self._open_until:
+                raise CircuitOpenError(self.name, self._open_until - now)
+            # Cool-down over: let a single trial call through, the others keep failing fast
+            if self._probing:
+                raise CircuitOpenError(self.name, self.reset_timeout)
+            self._state = HALF_OPEN
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                print(f"[CircuitBreaker] {self.name} recovered, closing the circuit")
+                metrics.set_circuit_open(self.name, False)
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def release(self):
+        """The trial call ended without telling anything about the upstream, e.g. it was rate limited locally"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self, error: Exception):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            quota = is_quota_error(error)
+            if quota or self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                timeout = self.quota_reset_timeout if quota else self.reset_timeout
+                self._state = OPEN
+                self._open_until = time.monotonic() + timeout
+                print(f"[CircuitBreaker] Opening the circuit of {self.name} for {timeout:.0f}s: {error}")
+                metrics.set_circuit_open(self.name, True)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def circuit_breaker(name: str) -> CircuitBreaker:
+    """The process-wide breaker of an upstream, shared by every tool instance"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+class RetryPolicy:
+    def __init__(self, name: str, max_attempts: int = RETRY_MAX_ATTEMPTS, base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY, retryable: Callable[[Exception], bool] = is_retryable,
+                 breaker: Optional[CircuitBreaker] = None):
+        """
+        Args:
+            name : upstream name, used in the retry metrics
+            max_attempts : attempts including the first one
+            base_delay : backoff ceiling of the first retry in seconds, doubled on every retry
+            max_delay : cap of the backoff ceiling
+            retryable : decides whether an error is worth another attempt
+            breaker : circuit breaker consulted before and updated after every attempt
+        """
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable = retryable
+        self.breaker = breaker
+
+    def backoff(self, retry: int) -> float:
+        """Full jitter: uniform in [0, min(max_delay, base_delay * 2^retry)]"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    def call(self, fn: Callable, *args, cancel: Optional[threading.Event] = None, **kwargs):
+        """
+        Calls fn until it succeeds, raises a non-retryable error, or runs out of attempts.
+        When the optional cancel event (or the one of the enclosing cancel_scope) is
+        set no further attempt is started.
+        """
+        scope = current_cancel()
+        for attempt in range(self.max_attempts):
+            if any(event is not None and event.is_set() for event in (cancel, scope)):
+                raise CancelledError(f"{self.name} call cancelled")
+            if self.breaker:
+                self.breaker.before_call()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if self.breaker:
+                    if is_failure(e):
+                        self.breaker.record_failure(e)
+                    else:
+                        self.breaker.release()
+                if attempt + 1 >= self.max_attempts or not self.retryable(e):
+                    raise
+                if self.breaker and self.breaker.state == OPEN:
+                    raise   # this failure opened the circuit, let the caller fail over now
+                delay = self.backoff(attempt)
+                print(f"[RetryPolicy] {self.name} attempt {attempt + 1} failed ({e}), retrying in {delay:.2f}s")
+                metrics.inc_retry(self.name)
+                if scope is not None:
+                    scope.wait(delay)   # wakes up as soon as the call is cancelled
+                else:
+                    time.sleep(delay)
+                continue
+            if self.breaker:
+                self.breaker.record_success()
+            return result
+
+    async def acall(self, coro_fn: Callable, *args, **kwargs):
+        """Event-loop version of call, coro_fn must return an awaitable. Cancelling the task stops it."""
+        for attempt in range(self.max_attempts):
+            if self.breaker:
+                self.breaker.before_call()
+            try:
+                result = await coro_fn(*args, **kwargs)
+            except asyncio.CancelledError:
+                if self.breaker:
+                    self.breaker.release()   # a cancelled trial call says nothing about the upstream
+                raise
+            except Exception as e:
+                if self.breaker:
+                    if is_failure(e):
+                        self.breaker.record_failure(e)
+                    else:
+                        self.breaker.release()
+                if attempt + 1 >= self.max_attempts or not self.retryable(e):
+                    raise
+                if self.breaker and self.breaker.state == OPEN:
+                    raise
+                delay = self.backoff(attempt)
+                print(f"[RetryPolicy] {self.name} attempt {attempt + 1} failed ({e}), retrying in {delay:.2f}s")
+                metrics.inc_retry(self.name)
+                await asyncio.sleep(delay)
+                continue
+            if self.breaker:
+                self.breaker.record_success()
+            return result
+
+
+class LatencyTracker:
+    """Sliding window of recent latencies of one upstream"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float, default: float, min_samples: int = 20) -> float:
+        """Nearest-rank q-th percentile, or default until min_samples latencies were seen"""
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return default
+            ordered = sorted(self._samples)
+        return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def hedge(primary: Callable[[], Any], secondary: Callable[[], Any], delay: float, executor,
+          useful: Callable[[Any], bool] = bool, cancel: Optional[threading.Event] = None, name: str = "hedge"):
+    """
+    Runs primary and, if it has not produced a useful result after delay seconds
+    (or failed before that), secondary as well. Returns the first useful result;
+    the other call is cancelled if it has not started and told to stop through
+    the cancel event otherwise.
+
+    Raises the error of the secondary call when neither produced a useful result,
+    and returns its (not useful) result when it did not raise.
+
+    Args:
+        primary, secondary : callables without arguments, run on executor
+        delay : seconds to wait for primary before firing secondary
+        executor : pool both calls run on
+        useful : decides whether a result is good enough to return
+        cancel : event set once a winner is known, the callables should watch it
+        name : label of the hedge metrics
+    """
+    futures = {executor.submit(primary): "primary"}
+    done, _ = wait(futures, timeout=delay)
+    raced = not done
+    if done:
+        future = next(iter(done))
+        if future.exception() is None and useful(future.result()):
+            return future.result()
+    else:
+        metrics.inc_hedge(name)
+        print(f"[hedge] {name}: primary slower than {delay:.2f}s, firing the secondary")
+    futures[executor.submit(secondary)] = "secondary"
+
+    outcomes = {}
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                outcomes[futures[future]] = e
+                continue
+            if useful(result):
+                if cancel is not None:
+                    cancel.set()
+                for loser in pending:
+                    loser.cancel()
+                if raced:
+                    metrics.inc_hedge_win(name, futures[future])
+                return result
+            outcomes[futures[future]] = result
+    if isinstance(outcomes.get("secondary"), Exception):
+        raise outcomes["secondary"]
+    return outcomes.get("secondary")
+
+
+async def ahedge(primary: Callable[[], Any], secondary: Callable[[], Any], delay: float,
+                 useful: Callable[[Any], bool] = bool, name: str = "hedge"):
+    """
+    Event-loop version of hedge: primary and secondary return awaitables, and the
+    loser is cancelled as a task instead of through a cancel event.
+    """
+    tasks = {asyncio.ensure_future(primary()): "primary"}
+    done, _ = await asyncio.wait(tasks, timeout=delay)
+    raced = not done
+    if done:
+        task = next(iter(done))
+        if task.exception() is None and useful(task.result()):
+            return task.result()
+    else:
+        metrics.inc_hedge(name)
+        print(f"[hedge] {name}: primary slower than {delay:.2f}s, firing the secondary")
+    tasks[asyncio.ensure_future(secondary())] = "secondary"
+
+    outcomes = {}
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    outcomes[tasks[task]] = task.exception()
+                    continue
+                if useful(task.result()):
+                    if raced:
+                        metrics.inc_hedge_win(name, tasks[task])
+                    return task.result()
+                outcomes[tasks[task]] = task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+    if isinstance(outcomes.get("secondary"), Exception):
+        raise outcomes["secondary"]
+    return outcomes.get("secondary")
@@ -0,0 +1,213 @@
+# server/tools/result_merger.py
+
+"""
+Normalization stage for search and news results.
+
+Results from Google CSE, SerpAPI and the news engines describe the same
+article under different URLs (tracking params, www., http/https, AMP paths)
+and with slightly different snippets. `merge_results` canonicalizes URLs,
+folds near-identical snippets together and ranks the merged items with
+reciprocal rank fusion, so an article found by several providers or queries
+appears once, ranked higher; the canonical URL is only the identity of an
+item, the URL handed out is the first one a provider returned for it. `published_at` turns the providers' dates ("3
+hours ago", "Mar 5, 2024", ISO timestamps) into timestamps for time ordering.
+`format_results` renders the compact text handed to the LLM.
+"""
+
+import re
+import time
+from datetime import datetime, timezone
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from shared.config import MERGE_SIMILARITY, MERGE_RRF_K
+
+# Query params that only track the click, never select the content
+_TRACKING_PARAMS = {
+    "gclid", "fbclid", "msclkid", "dclid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "ref", "ref_src", "referrer", "source", "cmpid", "ito", "ncid", "ocid", "sr_share", "smid",
+}
+_TRACKING_PREFIXES = ("utm_", "_hs", "pk_", "mkt_")
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def canonical_url(url: str) -> str:
+    """
+    Canonical form of a URL used to recognise the same page: https, lower-case
+    host without www./m./amp., no fragment, no tracking params, sorted query,
+    no trailing slash or /amp suffix.
+    """
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    for prefix in ("www.", "m.", "amp."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = re.sub(r"/+", "/", parts.path or "/")
+    path = re.sub(r"/amp/?$", "/", path)
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in _TRACKING_PARAMS and not k.lower().startswith(_TRACKING_PREFIXES)
+    )
+    return urlunsplit(("https", host, path, urlencode(query), ""))
+
+
+_RELATIVE_DATE = re.compile(r"^(\d+|an?)\s+(sec|min|hour|hr|day|week|month|year)s?\w*\s+ago$")
+_RELATIVE_SECONDS = {"sec": 1, "min": 60, "hour": 3600, "hr": 3600, "day": 86400,
+                     "week": 7 * 86400, "month": 30 * 86400, "year": 365 * 86400}
+_DATE_FORMATS = ("%b %d, %Y", "%B %d, %Y", "%d %b %Y", "%d %B %Y", "%m/%d/%Y", "%Y-%m-%d")
+
+
+def published_at(date: str, now: Optional[float] = None) -> Optional[float]:
+    """
+    Epoch seconds of a provider's publication date, None when it cannot be read.
+    Dates without a time zone are taken as UTC.
+
+    Args:
+        date : e.g. "3 hours ago", "yesterday", "Mar 5, 2024", "2024-03-05T10:00:00Z"
+        now : reference time of relative dates, defaults to the current time
+    """
+    if not date:
+        return None
+    now = time.time() if now is None else now
+    text = " ".join(str(date).lower().split())
+    if text in ("today", "just now"):
+        return now
+    if text == "yesterday":
+        return now - 86400
+    match = _RELATIVE_DATE.match(text)
+    if match:
+        amount = 1 if match.group(1) in ("a", "an") else int(match.group(1))
+        return now - amount * _RELATIVE_SECONDS[match.group(2)]
+
+    raw = str(date).strip()
+    try:
+        parsed = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    except ValueError:
+        parsed = None
+        # "03/05/2024, 10:00 AM, +0000 UTC": the day is enough to order news
+        for candidate in (raw, raw.split(",")[0].strip() if raw.count(",") > 1 else raw):
+            for fmt in _DATE_FORMATS:
+                try:
+                    parsed = datetime.strptime(candidate, fmt)
+                    break
+                except ValueError:
+                    continue
+            if parsed:
+                break
+    if parsed is None:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _shingles(text: str) -> frozenset:
+    words = _WORD.findall((text or "").lower())
+    if len(words) < 3:
+        return frozenset(words)
+    return frozenset(zip(words, words[1:], words[2:]))
+
+
+def similarity(a: frozenset, b: frozenset) -> float:
+    """
+    Overlap of two shingle sets relative to the smaller one, so a snippet that
+    is another one plus a few words still counts as a duplicate
+    """
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+@dataclass
+class SearchResult:
+    """One result of one provider"""
+    title: str = ""
+    snippet: str = ""
+    url: str = ""
+    source: str = ""              # provider, e.g. "google_cse", "serpapi", "serpapi_news"
+    rank: int = 0                 # 0-based position in the provider's list
+    date: Optional[str] = None
+
+
+@dataclass
+class MergedResult:
+    """A result after merging, possibly seen by several providers/queries"""
+    title: str
+    snippet: str
+    url: str
+    sources: List[str] = field(default_factory=list)
+    score: float = 0.0
+    date: Optional[str] = None
+    _shingles: frozenset = field(default=frozenset(), repr=False)
+
+    def to_dict(self) -> Dict:
+        item = {"title": self.title, "url": self.url, "snippet": self.snippet,
+                "sources": self.sources, "score": round(self.score, 4)}
+        if self.date:
+            item["date"] = self.date
+        return item
+
+
+def merge_results(result_lists: Iterable[List[SearchResult]], limit: Optional[int] = None,
+                  threshold: float = MERGE_SIMILARITY, k: int = MERGE_RRF_K) -> List[MergedResult]:
+    """
+    Merges ranked result lists into one deduplicated, ranked list.
+
+    Args:
+        result_lists : one ranked list per provider or query
+        limit : maximum number of merged results
+        threshold : snippet similarity (0-1) above which two results are the same item
+        k : reciprocal rank fusion constant, higher flattens the rank bonus
+    """
+    merged: List[MergedResult] = []
+    by_url: Dict[str, MergedResult] = {}
+    for results in result_lists:
+        for result in results:
+            if not (result.url or result.snippet):
+                continue
+            key = canonical_url(result.url)
+            # Providers decorate titles ("... - Reuters"), compare the snippets
+            shingles = _shingles(result.snippet or result.title)
+            item = by_url.get(key) if key else None
+            if item is None:
+                item = next((m for m in merged if similarity(m._shingles, shingles) >= threshold), None)
+            if item is None:
+                # The canonical URL only identifies the item, the link handed out is the one a provider returned
+                item = MergedResult(result.title, result.snippet, result.url, date=result.date, _shingles=shingles)
+                merged.append(item)
+            else:
+                # Keep the most informative text of the duplicates
+                if len(result.snippet or "") > len(item.snippet or ""):
+                    item.snippet = result.snippet
+                    item._shingles = shingles
+                if not item.title:
+                    item.title = result.title
+                if not item.url:
+                    item.url = result.url
+                item.date = item.date or result.date
+            if key:
+                by_url.setdefault(key, item)
+            if result.source and result.source not in item.sources:
+                item.sources.append(result.source)
+            item.score += 1.0 / (k + result.rank + 1)
+
+    merged.sort(key=lambda m: m.score, reverse=True)
+    return merged[:limit] if limit else merged
+
+
+def format_results(results: List[Dict]) -> str:
+    """Compact text of merged results for an LLM prompt"""
+    lines = []
+    for item in results:
+        head = item.get("title") or item.get("url", "")
+        if item.get("date"):
+            head = f"{head} ({item['date']})"
+        lines.append(f"{head}\n{item.get('snippet', '')}\nSource : {item.get('url', '')}")
+    return "\n\n".join(lines)
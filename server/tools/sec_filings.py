@@ -1,23 +1,52 @@
 # server/tools/sec_filings.py
 
-import requests
+import asyncio
+
+from shared.config import SEC_SUBMISSIONS_URL
+from shared.http import http_session, async_http_client
+from server.tools.rate_limiter import rate_limits
 
 class SECFilingsTool:
     """
     Fetches the latest 10-K or 10-Q filings from the SEC EDGAR system for a company.
     """
 
+    headers = {"User-Agent": "AutoInvestigator/1.0 contact@example.com"}
+
     def run(self, cik: str) -> str:
         print(f"[SECFilingsTool] Fetching SEC filings for CIK: {cik}")
-        url = f"https://data.sec.gov/submissions/CIK{cik.zfill(10)}.json"
-        headers = {"User-Agent": "AutoInvestigator/1.0 contact@example.com"}
+        # SEC blocks clients above 10 requests/second, raises RateLimitExceeded past the bounded wait
+        rate_limits.acquire("sec")
 
-        try:
-            res = requests.get(url, headers=headers)
-            data = res.json()
-        except Exception:
+        # Network and server errors propagate: a failed lookup must not be cached as the answer
+        res = http_session().get(self.url(cik), headers=self.headers)
+        if res.status_code == 404:
+            # EDGAR has no submissions for this CIK, a lasting answer
             return "Unable to retrieve filings."
+        res.raise_for_status()
+        return self.filings_text(res.json())
+
+    async def arun(self, cik: str) -> str:
+        """Event-loop version of run"""
+        client = async_http_client()
+        if client is None:
+            return await asyncio.to_thread(self.run, cik)
+        print(f"[SECFilingsTool] Fetching SEC filings for CIK: {cik}")
+        await rate_limits.aacquire("sec")
+
+        res = await client.get(self.url(cik), headers=self.headers)
+        if res.status_code == 404:
+            return "Unable to retrieve filings."
+        res.raise_for_status()
+        return self.filings_text(res.json())
+
+    @staticmethod
+    def url(cik: str) -> str:
+        return f"{SEC_SUBMISSIONS_URL}/CIK{cik.zfill(10)}.json"
 
+    @staticmethod
+    def filings_text(data: dict) -> str:
+        """The three latest 10-K/10-Q filings of a submissions document"""
         items = data.get("filings", {}).get("recent", {})
         docs = [
             f"{form} | {date} | https://www.sec.gov/Archives/{link}"
@@ -1,22 +1,203 @@
 # server/tools/sentiment_analyzer.py
 
-from transformers import pipeline
+"""
+Sentiment scoring of news snippets and articles.
+
+`run_batch` scores many texts with few forward passes: texts longer than the
+model window are split into overlapping token-window chunks, all chunks are
+sorted by length and grouped into batches bounded by SENTIMENT_BATCH_SIZE and
+SENTIMENT_BATCH_TOKENS (so short snippets are not padded to the length of a
+long article), and the chunk scores of each text are averaged weighted by
+their token counts. The model is loaded on first use, so the server starts
+without waiting for it.
+
+SENTIMENT_BACKEND selects how the model runs on CPU: "torch" (fp32), "int8"
+(PyTorch dynamic quantization of the linear layers) or "onnx" (ONNX Runtime
+through optimum). Scores are cached by a hash of model, backend and text, so
+a snippet seen in an earlier investigation is not scored again.
+"""
+
+import hashlib
+import threading
+from typing import Dict, List, Tuple
+
+from server.cache import ResultCache
+from shared.config import (
+    SENTIMENT_MODEL, SENTIMENT_MAX_TOKENS, SENTIMENT_STRIDE, SENTIMENT_BATCH_SIZE, SENTIMENT_BATCH_TOKENS,
+    SENTIMENT_BACKEND, SENTIMENT_CACHE_DB, SENTIMENT_CACHE_TTL,
+)
+
+NEUTRAL = {"label": "NEUTRAL", "score": 0.0, "chunks": 0}
+BACKENDS = ("torch", "int8", "onnx")
+
+
+def load_pipeline(model: str, backend: str = "torch"):
+    """
+    Sentiment-analysis pipeline of a model on the given CPU backend. Falls back
+    to "torch" when the optional packages of the backend are not installed.
+    """
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown sentiment backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    tokenizer = AutoTokenizer.from_pretrained(model)
+    if backend == "onnx":
+        try:
+            from optimum.onnxruntime import ORTModelForSequenceClassification
+            return pipeline("sentiment-analysis", tokenizer=tokenizer,
+                            model=ORTModelForSequenceClassification.from_pretrained(model, export=True))
+        except ImportError:
+            print("[SentimentAnalyzerTool] SENTIMENT_BACKEND=onnx needs optimum[onnxruntime], using torch")
+            backend = "torch"
+
+    classifier = AutoModelForSequenceClassification.from_pretrained(model)
+    if backend == "int8":
+        import torch
+        # Weights of the linear layers in int8, activations quantized on the fly
+        classifier = torch.quantization.quantize_dynamic(classifier, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipeline("sentiment-analysis", model=classifier, tokenizer=tokenizer)
+
 
 class SentimentAnalyzerTool:
-    def __init__(self):
-        # Using a distilled version for lighter compute requirements
-        self.sentiment_pipeline = pipeline(
-            "sentiment-analysis",
-            model="distilbert-base-uncased-finetuned-sst-2-english"
-        )
+    def __init__(self, model: str = SENTIMENT_MODEL, max_tokens: int = SENTIMENT_MAX_TOKENS,
+                 stride: int = SENTIMENT_STRIDE, batch_size: int = SENTIMENT_BATCH_SIZE,
+                 batch_tokens: int = SENTIMENT_BATCH_TOKENS, backend: str = SENTIMENT_BACKEND,
+                 cache_db: str = SENTIMENT_CACHE_DB):
+        """
+        Args:
+            model : Hugging Face model of the sentiment-analysis pipeline
+            max_tokens : model window in tokens, special tokens included
+            stride : tokens shared by consecutive chunks of a long text
+            batch_size : chunks per forward pass at most
+            batch_tokens : padded tokens per forward pass at most
+            backend : "torch", "int8" or "onnx"
+            cache_db : SQLite file of the score cache, None keeps it in memory only
+        """
+        self.model = model
+        self.backend = backend
+        self.max_tokens = max_tokens
+        self.stride = stride
+        self.batch_size = batch_size
+        self.batch_tokens = batch_tokens
+        self._pipeline = None
+        self._load_lock = threading.Lock()
+        # One forward pass at a time: torch already spreads a batch over all cores
+        self._infer_lock = threading.Lock()
+        self.cache = ResultCache(db_file=cache_db)
+
+    @property
+    def sentiment_pipeline(self):
+        """The transformers pipeline, loaded on first use"""
+        if self._pipeline is None:
+            with self._load_lock:
+                if self._pipeline is None:
+                    print(f"[SentimentAnalyzerTool] Loading {self.model} ({self.backend})")
+                    # Using a distilled version for lighter compute requirements
+                    self._pipeline = load_pipeline(self.model, self.backend)
+        return self._pipeline
+
+    def cache_key(self, text: str) -> str:
+        """Scores depend on the exact text and on the model and backend that produced them"""
+        return hashlib.sha256(f"{self.model}\0{self.backend}\0{text}".encode("utf-8")).hexdigest()
+
+    def chunks(self, text: str) -> List[Tuple[str, int]]:
+        """
+        Splits a text into overlapping windows the model can read whole.
+
+        Returns:
+            [(chunk text, token count), ...], a single chunk for texts that fit
+        """
+        tokenizer = self.sentiment_pipeline.tokenizer
+        window = self.max_tokens - tokenizer.num_special_tokens_to_add()
+        encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+        offsets = encoding["offset_mapping"]
+        if len(offsets) <= window:
+            return [(text, len(offsets))]
+        step = max(1, window - self.stride)
+        chunks = []
+        for start in range(0, len(offsets), step):
+            end = min(start + window, len(offsets))
+            # Slice the original text by character offsets instead of decoding the tokens
+            chunks.append((text[offsets[start][0]:offsets[end - 1][1]], end - start))
+            if end == len(offsets):
+                break
+        return chunks
+
+    def _batches(self, items: List[Tuple[int, str, int]]):
+        """Groups (owner, chunk, tokens) items of similar length into bounded batches"""
+        batch, longest = [], 0
+        for item in sorted(items, key=lambda item: item[2]):
+            padded = max(longest, item[2]) * (len(batch) + 1)
+            if batch and (len(batch) >= self.batch_size or padded > self.batch_tokens):
+                yield batch
+                batch, longest = [], 0
+            batch.append(item)
+            longest = max(longest, item[2])
+        if batch:
+            yield batch
+
+    def run_batch(self, texts: List[str]) -> List[Dict]:
+        """
+        Scores many texts at once.
+
+        Args:
+            texts : texts of any length
+
+        Returns:
+            [{label: "POSITIVE"|"NEGATIVE", score, chunks}, ...] in the order of texts, score being the
+            confidence in label; {label: "NEUTRAL", score: 0.0, chunks: 0} for empty texts
+        """
+        keys = [self.cache_key(text) if text and text.strip() else None for text in texts]
+        scores = {}
+        for key in keys:
+            if key and key not in scores:
+                hit, value = self.cache.get(key, "sentiment")
+                if hit:
+                    scores[key] = value
+        # Texts to score, each distinct text once
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key and key not in scores:
+                pending.setdefault(key, text)
+        print(f"[SentimentAnalyzerTool] Analyzing sentiment for {len(texts)} texts, "
+              f"{len(pending)} not cached.")
+        if pending:
+            for key, score in zip(pending, self._score(list(pending.values()))):
+                scores[key] = score
+                self.cache.set(key, score, SENTIMENT_CACHE_TTL, "sentiment")
+        return [dict(scores[key]) if key else dict(NEUTRAL) for key in keys]
+
+    def _score(self, texts: List[str]) -> List[Dict]:
+        """Runs the model over non-empty texts"""
+        items = []
+        for owner, text in enumerate(texts):
+            items.extend((owner, chunk, tokens) for chunk, tokens in self.chunks(text))
+
+        # Token-weighted probability of POSITIVE per text
+        positive = [0.0] * len(texts)
+        weights = [0] * len(texts)
+        counts = [0] * len(texts)
+        for batch in self._batches(items):
+            with self._infer_lock:
+                outputs = self.sentiment_pipeline([chunk for _, chunk, _ in batch], batch_size=len(batch),
+                                                  truncation=True)
+            for (owner, _, tokens), output in zip(batch, outputs):
+                p = output["score"] if output["label"].upper().startswith("POS") else 1.0 - output["score"]
+                weight = max(tokens, 1)
+                positive[owner] += p * weight
+                weights[owner] += weight
+                counts[owner] += 1
+
+        results = []
+        for owner in range(len(texts)):
+            p = positive[owner] / weights[owner]
+            label = "POSITIVE" if p >= 0.5 else "NEGATIVE"
+            results.append({"label": label, "score": round(max(p, 1.0 - p), 4), "chunks": counts[owner]})
+        return results
 
     def run(self, text: str) -> dict:
-        print(f"[SentimentAnalyzerTool] Analyzing sentiment for text.")
-        # The pipeline returns a list of dictionaries
-        results = self.sentiment_pipeline(text[:512]) # Truncate to model's max length
-        print(results)
-        return results[0] if results else {"label": "NEUTRAL", "score": 0.0}
+        return self.run_batch([text])[0]
 
 if __name__=='__main__':
 	ob = SentimentAnalyzerTool()
-	print(ob.run("I am winning the match"))
\ No newline at end of file
+	print(ob.run("I am winning the match"))
@@ -1,5 +1,6 @@
 import sqlite3
 import os
+import threading
 
 class TickerManager:
     """
@@ -7,8 +8,10 @@ class TickerManager:
     """
     def __init__(self):
         self.db_file = "server/resources/knowledge_base/ticker.db"
-        self.conn = sqlite3.connect(self.db_file)
+        # Shared by the worker threads of the dispatcher, every access goes through self._lock
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
         self.cursor = self.conn.cursor()
+        self._lock = threading.Lock()
         self._create_table()
 
     def _create_table(self):
@@ -22,8 +25,9 @@ class TickerManager:
                 cik_number TEXT NOT NULL
             );
             """
-            self.cursor.execute(query)
-            self.conn.commit()
+            with self._lock:
+                self.cursor.execute(query)
+                self.conn.commit()
         except sqlite3.Error as e:
             print(f"Database error: {e}")
 
@@ -35,9 +39,10 @@ class TickerManager:
         try:
             query = "INSERT OR IGNORE INTO tickers (company_name, ticker_name, cik_number) VALUES (?, ?, ?)"
             # MODIFIED: Pass cik_number to the query
-            self.cursor.execute(query, (company_name.lower(), ticker_name, str(cik_number)))
-            self.conn.commit()
-            return self.cursor.rowcount > 0
+            with self._lock:
+                self.cursor.execute(query, (company_name.lower(), ticker_name, str(cik_number)))
+                self.conn.commit()
+                return self.cursor.rowcount > 0
         except sqlite3.Error as e:
             print(f"Failed to upload data for {company_name}: {e}")
             return False
@@ -49,8 +54,9 @@ class TickerManager:
         """
         try:
             query = "SELECT ticker_name, cik_number FROM tickers WHERE company_name = ?"
-            self.cursor.execute(query, (company_name.lower(),))
-            result = self.cursor.fetchone()
+            with self._lock:
+                self.cursor.execute(query, (company_name.lower(),))
+                result = self.cursor.fetchone()
             if result:
                 return {"ticker": result[0], "cik": result[1]}
             return None
@@ -62,9 +68,10 @@ class TickerManager:
         """Updates the ticker for an existing company."""
         try:
             query = "UPDATE tickers SET ticker_name = ? WHERE company_name = ?"
-            self.cursor.execute(query, (new_ticker_name, company_name.lower()))
-            self.conn.commit()
-            return self.cursor.rowcount > 0
+            with self._lock:
+                self.cursor.execute(query, (new_ticker_name, company_name.lower()))
+                self.conn.commit()
+                return self.cursor.rowcount > 0
         except sqlite3.Error as e:
             print(f"Failed to update ticker: {e}")
             return False
@@ -1,10 +1,81 @@
 # server/tools/web_search.py
 
 from googleapiclient.discovery import build
-from shared.config import GOOGL_SEARCH_KEY,CSE,SERP_KEY
+from shared.config import GOOGL_SEARCH_KEY,CSE,SERP_KEY,SERP_URL,GOOGLE_CSE_URL
+from shared.http import http_session, async_http_client
+from shared.config import SEARCH_HEDGE, SEARCH_HEDGE_PERCENTILE, SEARCH_HEDGE_DEFAULT_DELAY, SEARCH_HEDGE_MIN_DELAY, SEARCH_HEDGE_WORKERS
+from shared.config import SEARCH_MAX_QUERIES, SEARCH_FANOUT_WORKERS
+from shared.utils import normalize_query, parse_window
+from server.tools.rate_limiter import rate_limits
+from server.tools.resilience import RetryPolicy, LatencyTracker, circuit_breaker, hedge, ahedge
+from server.tools.result_merger import SearchResult, merge_results, format_results
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
+import threading
 import time
-import requests
+
+# Shared by every instance: recent Google latencies decide when a hedge fires
+_google_latency = LatencyTracker()
+_hedge_pool = ThreadPoolExecutor(max_workers=SEARCH_HEDGE_WORKERS, thread_name_prefix="search-hedge")
+_fanout_pool = ThreadPoolExecutor(max_workers=SEARCH_FANOUT_WORKERS, thread_name_prefix="search-fanout")
+
+
+def google_date_restrict(window):
+    """Custom Search dateRestrict of a time window: "7d" -> "d7", hours round up to one day"""
+    parsed = parse_window(window)
+    if not parsed:
+        return None
+    amount, unit = parsed
+    return "d1" if unit == "h" else f"{unit}{amount}"
+
+
+def serp_time_filter(window):
+    """Google tbs filter of a time window for SerpAPI: "7d" -> "qdr:d7", "12h" -> "qdr:h12" """
+    parsed = parse_window(window)
+    return f"qdr:{parsed[1]}{parsed[0]}" if parsed else None
+
+
+def _google_date(result):
+    """Publication date from the page's metadata, when the site declares one"""
+    for tags in result.get("pagemap", {}).get("metatags", []):
+        for key in ("article:published_time", "og:updated_time", "date", "pubdate"):
+            if tags.get(key):
+                return tags[key]
+    return None
+
+
+def _google_results(results):
+    return [
+        SearchResult(result.get('title', ''), result.get('snippet', ''), result.get('link', ''), "google_cse", rank,
+                     _google_date(result))
+        for rank, result in enumerate(results.get('items',[]))
+    ]
+
+
+def _serp_results(results):
+    return [
+        SearchResult(result.get("title", ""), result.get("snippet"), result.get("link", ""), "serpapi", rank,
+                     result.get("date"))
+        for rank, result in enumerate(results.get("organic_results", []))
+        if result.get("snippet")
+    ]
+
+
+class _HTTPStatusError(Exception):
+    """Error status of an async upstream call, status_of reads it from .response"""
+
+    def __init__(self, message, response):
+        super().__init__(message)
+        self.response = response
+
+
+async def _aget_json(url, params):
+    """GET on the async client; error statuses raise with the body, which carries Google's quota reason"""
+    response = await async_http_client().get(url, params=params)
+    if response.is_error:
+        raise _HTTPStatusError(f"{response.status_code} {response.reason_phrase}: {response.text[:500]}", response)
+    return response.json()
 
 
 class WebSearchTool:
@@ -12,65 +83,270 @@ class WebSearchTool:
         self.ggl_api_key = os.getenv(GOOGL_SEARCH_KEY)
         self.serp_api_key = os.getenv(SERP_KEY)
         self.cse_id = os.getenv(CSE)
-        self.service = build("customsearch", "v1", developerKey=self.ggl_api_key)
+        self._local = threading.local()
+        # Breakers are shared process-wide, so every instance sees an outage at once
+        self.google_retry = RetryPolicy("google_cse", breaker=circuit_breaker("google_cse"))
+        self.serp_retry = RetryPolicy("serpapi", breaker=circuit_breaker("serpapi"))
+        self.hedge = SEARCH_HEDGE
 
-    def __google(self, query: str,num_results=5) -> str:
-        print(f"[WebSearchTool] Searching Google for: {query}")
-        extracted = []
-        
-        max_retries = 5
-        base_delay = 1
-        for attempt in range(max_retries):
-            try:
-                results = self.service.cse().list(
-                    q=query,
-                    cx=self.cse_id,
-                    num=num_results
-                ).execute()
-                
-                for result in results.get('items',[]):
-                    extracted.append(f"Title : {result.get('title')}\n Body : {result.get('snippet')}\nSource : {result.get('link')}")
-            except Exception as e:
-                time.sleep(base_delay)
-                #base_delay *=2
-                print(f"An error occurred: {e}")
-        return extracted
-        
-    def __serp(self,query:str,num_results:int=5):
-        print(f"[WebSearchTool] Searching SERP for: {query}")
+    @property
+    def service(self):
+        """Custom Search client of the calling thread, httplib2 connections must not be shared between threads"""
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = self._local.service = build("customsearch", "v1", developerKey=self.ggl_api_key)
+        return service
+
+    def __google_params(self, query, num_results, window):
+        params = {"q": query, "cx": self.cse_id, "num": num_results}
+        restrict = google_date_restrict(window)
+        if restrict:
+            params["dateRestrict"] = restrict
+        return params
+
+    def __serp_params(self, query, num_results, window):
         params = {
             "q": query,
             "api_key": self.serp_api_key,
             "engine": "google",
             "num": num_results
         }
+        tbs = serp_time_filter(window)
+        if tbs:
+            params["tbs"] = tbs
+        return params
 
-        response = requests.get("https://serpapi.com/search", params=params)
-        results = response.json()
+    def __google(self, query: str,num_results=5, cancel=None, window=None):
+        print(f"[WebSearchTool] Searching Google for: {query}")
+        params = self.__google_params(query, num_results, window)
+
+        def search():
+            rate_limits.acquire("google_cse")
+            return self.service.cse().list(**params).execute()
 
-        extracted = []
-        for result in results.get("organic_results", []):
-            snippet = result.get("snippet")
-            link = result.get("link")
-            if snippet:
-                extracted.append(f"{snippet}\n(Source: {link})")
-        return extracted
+        start = time.perf_counter()
+        results = self.google_retry.call(search, cancel=cancel)
+        _google_latency.observe(time.perf_counter() - start)
+        return _google_results(results)
         
+    def __serp(self,query:str,num_results:int=5, cancel=None, window=None):
+        print(f"[WebSearchTool] Searching SERP for: {query}")
+        params = self.__serp_params(query, num_results, window)
+
+        def search():
+            rate_limits.acquire("serpapi")
+            response = http_session().get(SERP_URL, params=params)
+            response.raise_for_status()
+            return response.json()
+
+        results = self.serp_retry.call(search, cancel=cancel)
+
+        return _serp_results(results)
+        
+    def __hedged(self, query: str, num_results: int = 5, window=None):
+        """
+        Google first; SERP as well once Google is slower than SEARCH_HEDGE_PERCENTILE
+        of its recent calls (or fails). The first non-empty answer wins.
+        """
+        delay = max(SEARCH_HEDGE_MIN_DELAY, _google_latency.percentile(SEARCH_HEDGE_PERCENTILE, SEARCH_HEDGE_DEFAULT_DELAY))
+        cancel = threading.Event()
+        return hedge(
+            lambda: self.__google(query, num_results, cancel, window),
+            lambda: self.__serp(query, num_results, cancel, window),
+            delay, _hedge_pool, cancel=cancel, name="websearch",
+        )
+
+    def search_results(self, query: str, num_results: int = 5, window=None):
+        """
+        Searches the Web and returns the raw SearchResult list of the provider that answered
+
+        Args:
+            query : query string
+            num_results : Maximum number of results(default 5)
+            window : only pages from this recent period, e.g. "7d" (default no restriction)
+
+        Raises:
+            the provider error (RateLimitExceeded, CircuitOpenError, HTTP errors) when no
+            provider answered, so an outage is reported instead of cached as "no results"
+        """
+        try:
+            if self.hedge and self.serp_api_key:
+                # Trades SERP quota for tail latency, see SEARCH_HEDGE
+                return self.__hedged(query,num_results,window) or []
+            google_error = None
+            try:
+                extracted = self.__google(query,num_results,window=window)
+            except Exception as e:
+                # Google is down, throttled or out of quota (circuit open): fail over to SERP right away
+                print(f"[WebSearchTool] Google search unavailable, failing over to SERP: {e}")
+                google_error = e
+                extracted = []
+            if len(extracted)==0:
+                try:
+                    extracted = self.__serp(query,num_results,window=window)
+                except Exception as e:
+                    if google_error is not None:
+                        raise
+                    # Google answered, with no results: that answer stands
+                    print(f"[WebSearchTool] SERP search failed: {e}")
+            return extracted or []
+        except Exception as e:
+            print(f"[WebSearchTool] Error occured while searching the web: {e}")
+            raise
+
+    def search(self, query: str, num_results: int = 5, window=None):
+        """
+        Searches the Web and returns structured results, deduplicated by canonical
+        URL and snippet: [{title, url, snippet, sources, score}, ...]
+
+        One provider answers each query (SERP only as failover or hedge, to spare
+        its quota), so this dedups within that provider's list; merging across
+        providers happens where several are queried on purpose, see NewsPipelineTool.
+
+        Args:
+            query : query string
+            num_results : Maximum number of results(default 5)
+            window : only pages from this recent period, e.g. "7d" (default no restriction)
+        """
+        results = self.search_results(query, num_results, window)
+        return [item.to_dict() for item in merge_results([results], limit=num_results)]
+
     def run(self,query:str, num_results:int=5):
         """
         This tool searches the Web
-        
+
         Args:
             query : query string
             num_results : Maximum number of results(default 5)
+
+        Raises:
+            the provider error when no provider answered, see search_results
         """
-        extracted = None
+        results = self.search(query, num_results)
+        return format_results(results) if results else "No relevant search results found."
+
+    def run_many(self, queries, num_results: int = 5):
+        """
+        Searches several queries concurrently, each under the shared rate limits.
+        Identical queries (up to case and spacing) are searched once.
+
+        Args:
+            queries : list of query strings, at most SEARCH_MAX_QUERIES
+            num_results : Maximum number of results per query(default 5)
+
+        Returns:
+            [{query, results: [{title, url, snippet, sources, score}, ...]}, ...] in the order
+            of queries; a query that could not run carries 'error' instead of results
+            (UTIL.get_web_search keeps such an answer out of the result cache).
+        """
+        if isinstance(queries, str):
+            queries = [queries]
+        if len(queries) > SEARCH_MAX_QUERIES:
+            raise ValueError(f"At most {SEARCH_MAX_QUERIES} queries per call, got {len(queries)}")
+        print(f"[WebSearchTool] Searching {len(queries)} queries concurrently")
+        futures = {}
+        for query in queries:
+            key = normalize_query(query)
+            if key not in futures:
+                futures[key] = _fanout_pool.submit(self.search, query, num_results)
+
+        answers = []
+        for query in queries:
+            try:
+                answers.append({"query": query, "results": futures[normalize_query(query)].result()})
+            except Exception as e:
+                # e.g. RateLimitExceeded: the other queries still return their results
+                answers.append({"query": query, "results": [], "error": str(e)})
+        return answers
+
+    # Event-loop versions, used by the ASGI mode: the same providers, failover, hedging
+    # and error semantics, with the upstream calls awaited on the shared async client
+
+    async def __agoogle(self, query: str, num_results=5, window=None):
+        print(f"[WebSearchTool] Searching Google for: {query}")
+        # googleapiclient has no async transport, the async path calls the REST endpoint it wraps
+        params = dict(self.__google_params(query, num_results, window), key=self.ggl_api_key)
+
+        async def search():
+            await rate_limits.aacquire("google_cse")
+            return await _aget_json(GOOGLE_CSE_URL, params)
+
+        start = time.perf_counter()
+        results = await self.google_retry.acall(search)
+        _google_latency.observe(time.perf_counter() - start)
+        return _google_results(results)
+
+    async def __aserp(self, query: str, num_results: int = 5, window=None):
+        print(f"[WebSearchTool] Searching SERP for: {query}")
+        params = self.__serp_params(query, num_results, window)
+
+        async def search():
+            await rate_limits.aacquire("serpapi")
+            return await _aget_json(SERP_URL, params)
+
+        return _serp_results(await self.serp_retry.acall(search))
+
+    async def asearch_results(self, query: str, num_results: int = 5, window=None):
+        """Event-loop version of search_results"""
+        if async_http_client() is None:
+            return await asyncio.to_thread(self.search_results, query, num_results, window)
         try:
-            extracted = self.__google(query,num_results)
+            if self.hedge and self.serp_api_key:
+                delay = max(SEARCH_HEDGE_MIN_DELAY, _google_latency.percentile(SEARCH_HEDGE_PERCENTILE, SEARCH_HEDGE_DEFAULT_DELAY))
+                return await ahedge(
+                    lambda: self.__agoogle(query, num_results, window),
+                    lambda: self.__aserp(query, num_results, window),
+                    delay, name="websearch",
+                ) or []
+            google_error = None
+            try:
+                extracted = await self.__agoogle(query, num_results, window)
+            except Exception as e:
+                print(f"[WebSearchTool] Google search unavailable, failing over to SERP: {e}")
+                google_error = e
+                extracted = []
             if len(extracted)==0:
-                extracted = self.__serp(query,num_results)
+                try:
+                    extracted = await self.__aserp(query, num_results, window)
+                except Exception as e:
+                    if google_error is not None:
+                        raise
+                    print(f"[WebSearchTool] SERP search failed: {e}")
+            return extracted or []
         except Exception as e:
-            print("Error occured while searching the web")
-        return "\n\n".join(extracted) if extracted else "No relevant search results found."
+            print(f"[WebSearchTool] Error occured while searching the web: {e}")
+            raise
 
-        
+    async def asearch(self, query: str, num_results: int = 5, window=None):
+        """Event-loop version of search"""
+        results = await self.asearch_results(query, num_results, window)
+        return [item.to_dict() for item in merge_results([results], limit=num_results)]
+
+    async def arun(self, query: str, num_results: int = 5):
+        """Event-loop version of run"""
+        results = await self.asearch(query, num_results)
+        return format_results(results) if results else "No relevant search results found."
+
+    async def arun_many(self, queries, num_results: int = 5):
+        """Event-loop version of run_many, the queries run as concurrent tasks instead of on the fan-out pool"""
+        if isinstance(queries, str):
+            queries = [queries]
+        if len(queries) > SEARCH_MAX_QUERIES:
+            raise ValueError(f"At most {SEARCH_MAX_QUERIES} queries per call, got {len(queries)}")
+        print(f"[WebSearchTool] Searching {len(queries)} queries concurrently")
+        # Identical queries (up to case and spacing) are searched once
+        first = {}
+        for query in queries:
+            first.setdefault(normalize_query(query), query)
+        outcomes = await asyncio.gather(*(self.asearch(query, num_results) for query in first.values()),
+                                        return_exceptions=True)
+        by_key = dict(zip(first, outcomes))
+
+        answers = []
+        for query in queries:
+            outcome = by_key[normalize_query(query)]
+            if isinstance(outcome, Exception):
+                answers.append({"query": query, "results": [], "error": str(outcome)})
+            else:
+                answers.append({"query": query, "results": outcome})
+        return answers
@@ -1,5 +1,20 @@
 # shared/config.py
 
+import os
+
+# Upstream endpoints, overridable so benchmarks can point the tools at local stand-ins
+SERP_URL = os.getenv("SERP_URL", "https://serpapi.com/search")
+GOOGLE_CSE_URL = os.getenv("GOOGLE_CSE_URL", "https://www.googleapis.com/customsearch/v1")   # REST endpoint of the async path
+SEC_SUBMISSIONS_URL = os.getenv("SEC_SUBMISSIONS_URL", "https://data.sec.gov/submissions")
+
+# shared/http config: pooled clients of all outbound calls
+HTTP_CONNECT_TIMEOUT = 3.05   # seconds to establish a connection
+HTTP_READ_TIMEOUT = 20        # seconds between bytes of an upstream answer
+HTTP_POOL_HOSTS = 16          # hosts whose keep-alive pools are kept
+HTTP_POOL_PER_HOST = 16       # connections per host, further calls wait for a free one
+HTTP2 = os.getenv("HTTP2", "off").lower() in ("1", "true", "on", "yes")   # needs httpx[http2]
+SERVER_READ_TIMEOUT = 300     # seconds the web client waits on a batch or PDF analysis
+
 # Web search config
 GOOGL_SEARCH_KEY = "GOOGL_SEARCH_KEY"
 CSE = "CSE"
@@ -9,10 +24,97 @@ SERP_KEY = "SERP_KEY"
 GEMINI_KEY = "GEMINI_KEY"
 GEMINI_MODEL = "gemini-2.0-flash"
 
+# server/tools/result_merger config
+MERGE_SIMILARITY = 0.8   # snippet similarity (0-1) above which two results count as the same item
+MERGE_RRF_K = 60         # reciprocal rank fusion constant
+
 # client/agents/news_scanner config
 REGION = "wt-wt"
 SAFE_SEARCH = "on"
 TIME_LIMIT = "10d"
 MAX_RESULTS = 10
 
+# server/tools/news_pipeline config (news_pipeline tool)
+NEWS_WINDOW = "7d"          # default time window of the pipeline
+NEWS_MAX_ITEMS = 20         # merged items returned
+NEWS_SOURCE_WORKERS = 16    # threads querying the news sources, shared by all calls
+
+# server/tools/sentiment_analyzer config (sentiment tool)
+SENTIMENT_MODEL = "distilbert-base-uncased-finetuned-sst-2-english"
+SENTIMENT_MAX_TOKENS = 512      # model window, special tokens included; longer texts are scored in chunks
+SENTIMENT_STRIDE = 64           # tokens shared by consecutive chunks of a long text
+SENTIMENT_BATCH_SIZE = 32       # chunks per forward pass at most
+SENTIMENT_BATCH_TOKENS = 8192   # padded tokens per forward pass at most, keeps batches of long chunks small
+SENTIMENT_MAX_TEXTS = 200       # texts accepted in one call
+SENTIMENT_BACKEND = os.getenv("SENTIMENT_BACKEND", "torch").lower()   # torch (fp32) | int8 (dynamic quantization) | onnx (needs optimum[onnxruntime])
+SENTIMENT_CACHE_DB = "server/resources/knowledge_base/sentiment_cache.db"   # scores by text hash, survives restarts
+SENTIMENT_CACHE_TTL = 30 * 24 * 60 * 60   # seconds a cached score is reused
+
+# server/tools/pdf_reader config
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", 1))   # processes extracting pages of large PDFs; opt-in, 1 extracts in-process
+PDF_PARALLEL_MIN_PAGES = 24   # smaller documents are not worth shipping to the pool
+PDF_TASKS_PER_WORKER = 4      # page ranges per worker, evens out pages of uneven cost
+PDF_MIN_PAGE_CHARS = 50       # pages where PyMuPDF finds less text go through pdfplumber
+PDF_TABLE_MIN_RULES = 6       # ruled lines/rectangles that make a page a table page for pdfplumber
+PDF_TABLE_NUMERIC_SHARE = 0.3 # share of numeric words that makes a page a table page for pdfplumber
+PDF_CACHE_DB = "server/resources/knowledge_base/pdf_cache.db"   # analyses and extractions by file hash
+PDF_CACHE_MAX_BYTES = 512 * 2 ** 20   # compressed size of the PDF cache, least recently used entries go first
+PDF_SPILL_BYTES = 16 * 2 ** 20   # larger uploads are spilled to a temp file instead of being analyzed in memory
+
+# server/request_handler config
+MAX_WORKERS = 8          # size of the worker pool shared by all batches
+TOOL_TIMEOUT = 60        # seconds a single tool call may take before it is reported as timed out, counted from its start
+MAX_ABANDONED_CALLS = MAX_WORKERS // 2   # timed-out calls still holding a worker; past it new calls fail fast
+CPU_WORKERS = 2          # threads running kind=CPU tools (model inference, PDF parsing), apart from the I/O pool
+
+# server/asgi config (SERVER_MODE=asgi)
+ASYNC_MAX_WORKERS = 32   # worker threads for blocking tools, the event loop handles the rest
+
+# server/cache config
+CACHE_DB = "server/resources/knowledge_base/result_cache.db"   # persistent tier, survives restarts
+CACHE_MEMORY_ENTRIES = 1024                                    # size of the in-memory LRU tier
+
+# server/jobs config (POST /jobs, /upload-pdf with async=true)
+JOBS_DB = "server/resources/knowledge_base/jobs.db"        # queued/running/finished jobs, survives restarts
+JOB_SPOOL_DIR = "server/resources/knowledge_base/job_spool" # uploads waiting for their job
+JOB_WORKERS = 4               # background worker pool
+JOB_MAX_PENDING = 256         # queued + running jobs before new submissions are refused
+JOB_RETENTION = 24 * 60 * 60  # seconds a finished job can still be polled
+JOB_MAX_ATTEMPTS = 3          # starts of one job (restarts included) before it is failed
+
+# server/tools/news_watchlist config (watchlist, news_updates tools)
+WATCHLIST_DB = "server/resources/knowledge_base/watchlist.db"   # watched companies and the articles already seen
+WATCHLIST_SCAN_INTERVAL = 6 * 60 * 60   # seconds between background scans of a company
+WATCHLIST_MIN_RESCAN = 15 * 60          # news_updates rescans a company last scanned longer ago than this
+WATCHLIST_POLL = 60                     # seconds between checks of the background monitor for due companies
+WATCHLIST_UPDATES_BUDGET = TOOL_TIMEOUT * 0.75   # seconds news_updates may spend, articles are marked delivered only within it
+WATCHLIST_MONITOR = os.getenv("WATCHLIST_MONITOR", "on").lower() in ("1", "true", "on", "yes")
+
+# server/tools/rate_limiter config: token bucket per metered upstream
+RATE_LIMITS = {
+    "google_cse": {"rate": 1.0, "burst": 5, "daily": int(os.getenv("GOOGLE_CSE_DAILY_QUOTA", 100))},  # free tier: 100 queries/day
+    "serpapi": {"rate": 1.0, "burst": 5},
+    "sec": {"rate": 10.0, "burst": 10},      # SEC EDGAR fair access: 10 requests/second
+    "gemini": {"rate": 0.25, "burst": 5},    # 15 requests/minute
+    "duckduckgo": {"rate": 1.0, "burst": 3},   # unofficial endpoint, throttles bursts
+}
+RATE_LIMIT_MAX_WAIT = 10   # seconds a call may be queued for its token before failing fast
+
+# server/tools/resilience config: retries and circuit breakers of upstream calls
+RETRY_MAX_ATTEMPTS = 3               # attempts per call, the first one included
+RETRY_BASE_DELAY = 0.5               # seconds, backoff ceiling doubles on every retry (full jitter)
+RETRY_MAX_DELAY = 8                  # seconds, cap of the backoff ceiling
+CIRCUIT_FAILURE_THRESHOLD = 5        # consecutive failures that open a circuit
+CIRCUIT_RESET_TIMEOUT = 60           # seconds an open circuit waits before a trial call
+CIRCUIT_QUOTA_RESET_TIMEOUT = 3600   # seconds a circuit stays open after a quota error
+
+# server/tools/web_search hedging: fire SerpAPI when Google CSE is slower than usual
+SEARCH_HEDGE = os.getenv("SEARCH_HEDGE", "off").lower() in ("1", "true", "on", "yes")   # costs extra SerpAPI quota
+SEARCH_HEDGE_PERCENTILE = float(os.getenv("SEARCH_HEDGE_PERCENTILE", 95))   # of recent Google latencies
+SEARCH_HEDGE_DEFAULT_DELAY = 1.5   # seconds, used until enough Google latencies were seen
+SEARCH_HEDGE_MIN_DELAY = 0.2       # seconds, floor of the hedge delay
+SEARCH_HEDGE_WORKERS = 16          # threads running the hedged provider calls
 
+# server/tools/web_search multi-query calls (websearch with 'queries')
+SEARCH_MAX_QUERIES = 10      # queries accepted in one call
+SEARCH_FANOUT_WORKERS = 16   # threads running the queries of multi-query calls, shared by all calls
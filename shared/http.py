@@ -0,0 +1,161 @@
+# shared/http.py
+
+"""
+Pooled HTTP clients for all outbound traffic.
+
+Every tool in server/tools/ goes through `http_session()` and the web client
+talks to the server through `server_session()`, so connections (and their TLS
+sessions) are kept alive and reused instead of being set up for every call.
+Both apply default connect/read timeouts and cap the connections per host.
+
+With HTTP2=on and the optional `httpx[http2]` extra installed, `http_session()`
+multiplexes the tool traffic over HTTP/2 instead. `async_http_client()` is the
+event-loop counterpart used by the tools' async variants in ASGI mode.
+"""
+
+import asyncio
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from shared.config import (
+    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_POOL_HOSTS, HTTP_POOL_PER_HOST, HTTP2, SERVER_READ_TIMEOUT,
+)
+
+try:
+    import httpx
+    # Its INFO line of every request carries the full URL, API keys in the query included
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+except ImportError:
+    httpx = None
+
+# Errors worth retrying whichever client raised them
+TRANSIENT_ERRORS = (requests.Timeout, requests.ConnectionError, TimeoutError, ConnectionError)
+if httpx is not None:
+    TRANSIENT_ERRORS += (httpx.TimeoutException, httpx.NetworkError)
+
+
+class PooledSession(requests.Session):
+    """requests.Session with keep-alive pools capped per host and a default timeout"""
+
+    def __init__(self, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+                 pool_hosts: int = HTTP_POOL_HOSTS, pool_per_host: int = HTTP_POOL_PER_HOST):
+        """
+        Args:
+            timeout : (connect, read) seconds used when a call passes no timeout
+            pool_hosts : hosts whose connection pools are kept
+            pool_per_host : connections per host, further callers wait for a free one
+        """
+        super().__init__()
+        self.timeout = timeout
+        adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_per_host, pool_block=True)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+class Http2Session:
+    """
+    The part of the requests.Session API used by the tools, on an HTTP/2 httpx.Client.
+    Responses are httpx.Response objects (json, raise_for_status, status_code, text).
+    """
+
+    def __init__(self, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+                 pool_hosts: int = HTTP_POOL_HOSTS, pool_per_host: int = HTTP_POOL_PER_HOST):
+        connect, read = timeout
+        # httpx limits connections per client, not per host
+        self.client = httpx.Client(
+            http2=True,
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=httpx.Limits(max_connections=pool_hosts * pool_per_host, max_keepalive_connections=pool_per_host),
+        )
+
+    def request(self, method, url, timeout=None, **kwargs):
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        return self.client.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        self.client.close()
+
+
+def _http2_available() -> bool:
+    if httpx is None:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+_lock = threading.Lock()
+_sessions = {}
+
+
+def http_session():
+    """Process-wide session for the tools' upstream calls"""
+    with _lock:
+        if "tools" not in _sessions:
+            if HTTP2 and _http2_available():
+                _sessions["tools"] = Http2Session()
+            else:
+                if HTTP2:
+                    print("[http] HTTP2 is on but httpx[http2] is not installed, using HTTP/1.1")
+                _sessions["tools"] = PooledSession()
+        return _sessions["tools"]
+
+
+def async_http_client():
+    """
+    httpx.AsyncClient of the running event loop for the tools' async variants, with
+    the same timeouts and pool size as http_session(). None when httpx is not
+    installed, the callers then run their blocking version on a thread instead.
+    """
+    if httpx is None:
+        return None
+    loop = asyncio.get_running_loop()
+    with _lock:
+        # A client is bound to the loop it was created on
+        entry = _sessions.get("async")
+        if entry is None or entry[0] is not loop:
+            client = httpx.AsyncClient(
+                http2=HTTP2 and _http2_available(),
+                timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=HTTP_POOL_HOSTS * HTTP_POOL_PER_HOST,
+                                    max_keepalive_connections=HTTP_POOL_PER_HOST),
+            )
+            entry = _sessions["async"] = (loop, client)
+        return entry[1]
+
+
+async def aclose_async_http():
+    """Closes the async client of the running loop, at ASGI shutdown"""
+    with _lock:
+        entry = _sessions.pop("async", None)
+    if entry is not None and entry[0] is asyncio.get_running_loop():
+        await entry[1].aclose()
+
+
+def server_session() -> PooledSession:
+    """
+    Process-wide session for the web client's calls to the server, with a read
+    timeout long enough for whole batches and PDF analysis.
+    """
+    with _lock:
+        if "server" not in _sessions:
+            _sessions["server"] = PooledSession(timeout=(HTTP_CONNECT_TIMEOUT, SERVER_READ_TIMEOUT))
+        return _sessions["server"]
@@ -0,0 +1,105 @@
+# shared/utils.py
+
+import hashlib
+import json
+import re
+
+_WHITESPACE = re.compile(r"\s+")
+_PUNCTUATION = re.compile(r"[.,'\"!?()&]+")
+# Legal-form suffixes that do not change which company is meant
+_COMPANY_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company",
+    "ltd", "limited", "llc", "plc", "sa", "ag", "nv", "gmbh",
+}
+
+
+def normalize_text(value: str) -> str:
+    """Case-folds and collapses whitespace so trivial variants of a string compare equal"""
+    return _WHITESPACE.sub(" ", value).strip().casefold()
+
+
+def normalize_query(value: str) -> str:
+    """normalize_text plus dropping trailing punctuation, for search queries"""
+    return normalize_text(value).rstrip(" .?!")
+
+
+def normalize_company(name: str) -> str:
+    """
+    Normalizes a company name so "Apple Inc.", "apple  inc" and "APPLE" compare equal.
+    """
+    words = _PUNCTUATION.sub(" ", normalize_text(name)).split()
+    if words and words[0] == "the":
+        words = words[1:]
+    while len(words) > 1 and words[-1] in _COMPANY_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+def normalize_cik(cik: str) -> str:
+    """SEC CIKs are zero padded to 10 digits in some places and not in others"""
+    return cik.strip().lstrip("0") or "0"
+
+
+_WINDOW = re.compile(r"^(\d+)\s*(h|hours?|d|days?|w|weeks?|m|months?|y|years?)$")
+_WINDOW_SECONDS = {"h": 3600, "d": 86400, "w": 7 * 86400, "m": 30 * 86400, "y": 365 * 86400}
+
+
+def parse_window(window: str):
+    """
+    Parses a time window such as "12h", "7d", "2w", "1m" (month) or "1 year".
+
+    Returns:
+        (amount, unit) with unit one of "h", "d", "w", "m", "y"; None for an empty window
+    """
+    if not window:
+        return None
+    match = _WINDOW.match(normalize_text(str(window)))
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid time window '{window}', expected e.g. '24h', '7d', '2w', '1m' or '1y'")
+    return int(match.group(1)), match.group(2)[0]
+
+
+def window_seconds(window: str):
+    """Length of a time window in seconds, None for an empty window"""
+    parsed = parse_window(window)
+    return parsed[0] * _WINDOW_SECONDS[parsed[1]] if parsed else None
+
+
+def normalize_window(window: str) -> str:
+    """Canonical form of a time window: "7 days" and "7D" both become 7d"""
+    parsed = parse_window(window)
+    return f"{parsed[0]}{parsed[1]}" if parsed else ""
+
+
+def normalize_params(value):
+    """
+    Recursively normalizes a params structure: strings via normalize_text,
+    dict keys sorted by json.dumps later, lists kept in order.
+    """
+    if isinstance(value, str):
+        return normalize_text(value)
+    if isinstance(value, dict):
+        return {k: normalize_params(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_params(v) for v in value]
+    return value
+
+
+def call_key(name: str, params: dict, normalizers: dict = None) -> str:
+    """
+    Stable key of a tool call: tool name plus a digest of its normalized params.
+
+    Args:
+        name : tool name, e.g. "websearch"
+        params : params the tool is called with
+        normalizers : optional param name -> normalizer applied before the generic normalization
+    """
+    params = dict(params or {})
+    for param, normalizer in (normalizers or {}).items():
+        value = params.get(param)
+        if isinstance(value, str):
+            params[param] = normalizer(value)
+        elif isinstance(value, (list, tuple)):
+            params[param] = [normalizer(v) if isinstance(v, str) else v for v in value]
+    payload = json.dumps(normalize_params(params), sort_keys=True, default=str)
+    return f"{name}:{hashlib.sha1(payload.encode('utf-8')).hexdigest()}"